@@ -4,6 +4,10 @@ import argparse
 import sys
 import shutil
 from datetime import datetime
+import numpy
+
+sys.path.append(str(Path(__file__).resolve().parent/'newapi'))
+from tfpy.matrix_translations import write_magma_matrix
 
 import contextlib
 
@@ -27,7 +31,7 @@ parser.add_argument('-e','--existing', action='count', default=0, help='connect
 parser.add_argument('-u','--unit', default='i', help='name of complex unit (default is `i\')')
 parser.add_argument('-f','--field', default='CC', help='name of complex field (default is `CC\')')
 parser.add_argument('-v','--var', default='V', help='name of array variable to product (default is `V\')')
-parser.add_argument('-a','--accuracy', default=6,type=int, help='number of decimal places to output (default is 6)')
+parser.add_argument('-a','--accuracy', default=6,type=int, help='number of significant digits to output (default is 6)')
 
 args = parser.parse_args()
 filename = Path(args.filename)
@@ -61,17 +65,5 @@ result = eng.getfield(matfile,'result')
 if result == None:
     sys.exit('No result array in input file.')
 
-
-rows = int(eng.size(result, 1));
-cols = int(eng.size(result, 2));
-reals = eng.real(result);
-imags = eng.imag(result);
-
 with smart_open(output_filename) as f:
-    f.write(f'{var}:=Matrix({field},{rows},{cols},[\n')
-    for i in range(0,rows):
-        for j in range(0,cols):
-            f.write(f'    {reals[i][j]:.{accuracy}} + {imags[i][j]:.{accuracy}}*{unit}')
-            if not ((i == rows - 1) and (j == cols - 1)):
-                f.write(',\n')
-    f.write('\n]);\n')
+    write_magma_matrix(numpy.array(result), f, var, field, accuracy, unit)
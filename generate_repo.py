@@ -1,9 +1,16 @@
-import matlab.engine
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
+import hashlib
+import json
+import os
 import sys
 import shutil
 from datetime import datetime
+import numpy
+
+sys.path.append(str(Path(__file__).resolve().parent/'newapi'))
+from tfpy.matrix_translations import write_magma_matrix, read_mat_variables
 
 def print_header(f, title, magma):
     f.write(f'''<!DOCTYPE html>
@@ -44,175 +51,190 @@ def print_footer(f):
     </body>
 </html>''')
 
+# Version of the cache format; bump it to force every file to be parsed again.
+CACHE_VERSION = 1
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_design(path, cached = None):
+    """Read the metadata of a runtf.m output file.
+
+    Returns a dictionary with the file's hash and either t, d, n, error and comment, or a
+    'problem' saying why the file cannot be listed. If the hash is that of the cached metadata,
+    the file is not parsed again.
+    """
+    metadata = {'hash': file_hash(path)}
+    if cached is not None and cached.get('hash') == metadata['hash']:
+        return dict(cached)
+    try:
+        variables = read_mat_variables(path, ['result', 't', 'd', 'n', 'errors', 'comment'])
+    except Exception as e:
+        metadata['problem'] = f'Cannot read file ({e}).'
+        return metadata
+    if numpy.size(variables.get('result', [])) == 0:
+        metadata['problem'] = 'No result array.'
+        return metadata
+
+    for key in ['t', 'd', 'n']:
+        metadata[key] = int(numpy.asarray(variables[key]).ravel()[0])
+
+    # The error is the last entry of the errors array, which may be a scalar.
+    try:
+        metadata['error'] = float(numpy.asarray(variables['errors']).ravel()[-1])
+    except (KeyError, IndexError, ValueError, TypeError):
+        metadata['problem'] = f'Failed to parse error {variables.get("errors")}'
+        return metadata
 
+    comment = numpy.asarray(variables.get('comment', '')).ravel()
+    metadata['comment'] = str(comment[0]) if comment.size > 0 else ''
+    return metadata
 
+def write_magma(path, f, accuracy = 15):
+    "Write Magma code defining the result matrix of a .mat file to f."
+    write_magma_matrix(numpy.asarray(read_mat_variables(path, ['result'])['result']), f, accuracy = accuracy)
 
-
-
-
-
-
-parser = argparse.ArgumentParser(description='Generate a database of designs from a given set of runtf.m output files.')
-parser.add_argument('directory', metavar='DIR', help='directory to scan')
-parser.add_argument('-R','--recursive', action='store_true', help='scan DIR recursively')
-parser.add_argument('-e','--existing', action='count', default=0, help='connect to a running MATLAB session; specify twice to skip MATLAB verification prompt')
-parser.add_argument('-t','--threshold', action='store', default=-10, help='threshold to include, error must be < 10^-t')
-parser.add_argument('-o','--output', default='html', help='output directory')
-parser.add_argument('-u','--unique', action='count', default = 0, help='keep only the best value for each t,d,n; specify twice to only keep the best n meeting the threshold')
-parser.add_argument('-m','--magma', action='store_true', help='also generate magma files')
-parser.add_argument('-s','--skipcopy', action='store_true', help='skip actually copying or writing anything but the html file')
-
-args = parser.parse_args()
-search_dir = Path(args.directory)
-if not search_dir.is_dir():
-    sys.exit('Argument is not a directory.')
-
-output_dir = Path(args.output)
-output_dir.mkdir(parents=True,exist_ok=True)
-recurse = (args.recursive == True)
-existing = args.existing
-threshold = int(args.threshold)
-unique = args.unique
-magma = args.magma
-skipcopy = args.skipcopy
-
-if recurse:
-    mat_files = sorted(list(search_dir.glob('**/*.mat')))
-else:
-    mat_files = sorted(list(search_dir.glob('*.mat')))
-
-designs = []
-
-# -e but not -ee specified, so print usage and wait for user OK.
-if existing == 1:
-    print('In the running MATLAB session enter the command:\tmatlab.engine.shareEngine')
-    input("Press Enter to continue...")
-
-
-if existing > 0:
-    if(matlab.engine.find_matlab() == ()):
-        sys.exit('MATLAB is not running, or you didn\'t heed the prompt...')
-    eng = matlab.engine.connect_matlab()
-else:
-    eng = matlab.engine.start_matlab()
-
-for f in mat_files:
-    matfile = eng.matfile(str(f.resolve()))
-    if eng.getfield(matfile,'result') == None:
-        print(f'Saw {str(f)}\t\tNo result array.')
-        continue
-    print(f'Saw {str(f)}\t\tand parsing.')
-
-    new_design = {}
-    new_design['t'] = int(eng.getfield(matfile,'t'))
-    new_design['d'] = int(eng.getfield(matfile,'d'))
-    new_design['n'] = int(eng.getfield(matfile,'n'))
-
-    # Try really hard to get the error out of the Matlab array it may or may not be wrapped in
-    error_pack = eng.getfield(matfile,'errors');
+def is_stale(source, target):
+    "Whether target is missing or older than source."
     try:
-      new_design['error'] = float(error_pack[0][-1])
-    except:
-      try:
-        new_design['error'] = float(error_pack)
-      except:
-        pass
-    if not ('error' in new_design):
-      print('Failed to parse error ', error_pack)
-      continue
-
+        return target.stat().st_mtime_ns < source.stat().st_mtime_ns
+    except FileNotFoundError:
+        return True
 
+def publish_design(original_file, target_file, magma_file):
+    "Copy a .mat file into the output directory and write its Magma file, skipping what is up to date."
+    original = os.stat(original_file)
+    try:
+        target = os.stat(target_file)
+        changed = target.st_size != original.st_size or target.st_mtime_ns != original.st_mtime_ns
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        Path(target_file).parent.mkdir(parents=True,exist_ok=True)
+        shutil.copy2(original_file, target_file)
+
+    if magma_file is not None and is_stale(Path(original_file), Path(magma_file)):
+        Path(magma_file).parent.mkdir(parents=True,exist_ok=True)
+        with open(magma_file, 'w') as mf:
+            write_magma(original_file, mf)
+    return changed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a database of designs from a given set of runtf.m output files.')
+    parser.add_argument('directory', metavar='DIR', help='directory to scan')
+    parser.add_argument('-R','--recursive', action='store_true', help='scan DIR recursively')
+    parser.add_argument('-t','--threshold', action='store', default=-10, help='threshold to include, error must be < 10^-t')
+    parser.add_argument('-o','--output', default='html', help='output directory')
+    parser.add_argument('-u','--unique', action='count', default = 0, help='keep only the best value for each t,d,n; specify twice to only keep the best n meeting the threshold')
+    parser.add_argument('-m','--magma', action='store_true', help='also generate magma files')
+    parser.add_argument('-s','--skipcopy', action='store_true', help='skip actually copying or writing anything but the html file')
+    parser.add_argument('-j','--workers', type=int, default=os.cpu_count(), help='number of processes parsing and writing files (default: one per CPU)')
+    parser.add_argument('-c','--cache', default=None, help='file caching the metadata of parsed files (default: OUTPUT/.generate_repo_cache.json)')
+
+    args = parser.parse_args()
+    search_dir = Path(args.directory)
+    if not search_dir.is_dir():
+        sys.exit('Argument is not a directory.')
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True,exist_ok=True)
+    recurse = (args.recursive == True)
+    threshold = int(args.threshold)
+    unique = args.unique
+    magma = args.magma
+    skipcopy = args.skipcopy
+
+    if recurse:
+        mat_files = sorted(list(search_dir.glob('**/*.mat')))
+    else:
+        mat_files = sorted(list(search_dir.glob('*.mat')))
+
+    # The cache maps each file to its size, mtime and parsed metadata; files whose size and mtime
+    # are unchanged are not read again, and files that were only touched are recognised by hash.
+    cache_file = Path(args.cache) if args.cache is not None else output_dir/'.generate_repo_cache.json'
     try:
-      new_design['comment'] = str(eng.getfield(matfile,'comment'))
-    except:
-      new_design['comment'] = ''
-
-    # Produce output filenames
-    relative_filename = output_dir/f.relative_to(search_dir)
-    new_design['original_file'] = f
-    new_design['filename'] = relative_filename.relative_to(output_dir)
-
-    # Magma data
-    if magma:
-      new_design['magma_file'] = new_design['filename'].with_suffix('.magma')
-
-      unit = 'i'
-      field = 'CC'
-      var = 'V'
-      accuracy = '15'
-      d = new_design['d']
-      n = new_design['n']
-
-      result = eng.getfield(matfile,'result')
-      reals = eng.real(result);
-      imags = eng.imag(result);
-
-      magma_string = f'{var}:=Matrix({field},{d},{n},[\n'
-      for i in range(0,d):
-          for j in range(0,n):
-              magma_string += f'    {reals[i][j]:.{accuracy}} + {imags[i][j]:.{accuracy}}*{unit}'
-              if not ((i == d - 1) and (j == n - 1)):
-                  magma_string += ',\n'
-      magma_string += '\n]);\n'
-      new_design['magma_text'] = magma_string
-
-
-    if new_design['error'] > (10**(-threshold)):
-      continue
-
-    is_admissible = True
-    if unique == 1:
-      for design in list(designs):
-        if design['t'] == new_design['t'] and design['d'] == new_design['d'] and design['n'] == new_design['n']:
-          is_admissible = False
-          if design['error'] > new_design['error']:
-            designs.remove(design)
-            is_admissible = True
-
-    if unique == 2:
-      for design in list(designs):
-        if design['t'] == new_design['t'] and design['d'] == new_design['d']:
-          is_admissible = False
-          if design['n'] == new_design['n'] and design['error'] > new_design['error']:
-            designs.remove(design)
-            is_admissible = True
-          if design['n'] > new_design['n']:
-            designs.remove(design)
-            is_admissible = True
-
-    if is_admissible:
-      designs.append(new_design)
-
-designs = sorted(designs, key=lambda k: k['error'])
-designs = sorted(designs, key=lambda k: k['n'])
-designs = sorted(designs, key=lambda k: k['d'])
-designs = sorted(designs, key=lambda k: k['t'])
-
-
-with (output_dir/'index.html').open(mode='w') as f:
-    print_header(f,search_dir.resolve(),magma)
-    for design in designs:
-        # Copy matlab file
-        if not skipcopy:
-          (output_dir/design['filename']).parent.mkdir(parents=True,exist_ok=True)
-          shutil.copy(design['original_file'],output_dir/design['filename'])
-
-        # Produce magma file
+        with cache_file.open() as f:
+            cache = json.load(f)
+        if cache.get('version') != CACHE_VERSION:
+            cache = {}
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    cached_files = cache.get('files', {})
+
+    stats = {str(f): f.stat() for f in mat_files}
+    to_parse = [f for f in mat_files if str(f) not in cached_files
+                                        or cached_files[str(f)]['size'] != stats[str(f)].st_size
+                                        or cached_files[str(f)]['mtime'] != stats[str(f)].st_mtime_ns]
+    print(f'{len(mat_files)} files found, {len(to_parse)} new or changed.')
+
+    files = {str(f): cached_files[str(f)] for f in mat_files if str(f) in cached_files}
+    with ProcessPoolExecutor(args.workers) as pool:
+        for f, metadata in zip(to_parse, pool.map(parse_design, map(str, to_parse), [cached_files.get(str(f)) for f in to_parse], chunksize=16)):
+            if 'problem' in metadata:
+                print(f'Saw {str(f)}\t\t{metadata["problem"]}')
+            else:
+                print(f'Saw {str(f)}\t\tand parsing.')
+            metadata['size'] = stats[str(f)].st_size
+            metadata['mtime'] = stats[str(f)].st_mtime_ns
+            files[str(f)] = metadata
+
+    temporary = cache_file.with_name(cache_file.name + '.tmp')
+    with temporary.open('w') as f:
+        json.dump({'version': CACHE_VERSION, 'files': files}, f)
+    temporary.replace(cache_file)
+
+    # Choose the designs to list in one pass: with -u the best error for each (t, d, n), with -uu
+    # the smallest n (then the best error) for each (t, d).
+    best = {}
+    for index, f in enumerate(mat_files):
+        metadata = files[str(f)]
+        if 'problem' in metadata or metadata['error'] > (10**(-threshold)):
+            continue
+        if unique == 1:
+            key, rank = (metadata['t'], metadata['d'], metadata['n']), metadata['error']
+        elif unique >= 2:
+            key, rank = (metadata['t'], metadata['d']), (metadata['n'], metadata['error'])
+        else:
+            key, rank = index, 0
+        if key not in best or rank < best[key][0]:
+            best[key] = (rank, f)
+
+    designs = []
+    for _, f in best.values():
+        new_design = dict(files[str(f)])
+        new_design['original_file'] = f
+        new_design['filename'] = (output_dir/f.relative_to(search_dir)).relative_to(output_dir)
         if magma:
-            magma_file = design['magma_file'] # Get around the fact we can't index into a dict in a nested format string
-            if not skipcopy:
-                with open(output_dir/design['magma_file'], 'w') as mf:
-                    mf.write(design['magma_text'])
-
-        f.write(f'''            <tr style="background-color: {'#ff8080' if design['error'] < 1e-12 else '#ffdd80' if design['error'] < 1e-9 else '#87c9ff;' if design['error'] < 1e-4 else '#80ffc2' if design['error'] < 1 else '#fff'}">
-                <td>{design['t']}</td>
-                <td>{design['d']}</td>
-                <td>{design['n']}</td>
-                <td>{'%E'%design['error']}</td>
-                <td>{design['error']}</td>
-                <td><small>{design['comment']}</small></td>
-                <td><a href="{design['filename']}">matlab file</a></td>
-                {f'<td><a href="{magma_file}">magma file</a></td>' if magma else ''}
-            </tr>'''
-        )
-    print_footer(f)
+          new_design['magma_file'] = new_design['filename'].with_suffix('.magma')
+        designs.append(new_design)
+
+    designs = sorted(designs, key=lambda k: (k['t'], k['d'], k['n'], k['error']))
+
+    if not skipcopy:
+        with ProcessPoolExecutor(args.workers) as pool:
+            copied = sum(pool.map(publish_design, [str(design['original_file']) for design in designs],
+                                                  [str(output_dir/design['filename']) for design in designs],
+                                                  [str(output_dir/design['magma_file']) if magma else None for design in designs], chunksize=16))
+        print(f'{len(designs)} designs listed, {copied} files copied.')
+
+    with (output_dir/'index.html').open(mode='w') as f:
+        print_header(f,search_dir.resolve(),magma)
+        for design in designs:
+            magma_file = design.get('magma_file') # Get around the fact we can't index into a dict in a nested format string
+
+            f.write(f'''            <tr style="background-color: {'#ff8080' if design['error'] < 1e-12 else '#ffdd80' if design['error'] < 1e-9 else '#87c9ff;' if design['error'] < 1e-4 else '#80ffc2' if design['error'] < 1 else '#fff'}">
+                    <td>{design['t']}</td>
+                    <td>{design['d']}</td>
+                    <td>{design['n']}</td>
+                    <td>{'%E'%design['error']}</td>
+                    <td>{design['error']}</td>
+                    <td><small>{design['comment']}</small></td>
+                    <td><a href="{design['filename']}">matlab file</a></td>
+                    {f'<td><a href="{magma_file}">magma file</a></td>' if magma else ''}
+                </tr>'''
+            )
+        print_footer(f)
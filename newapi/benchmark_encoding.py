@@ -0,0 +1,28 @@
+import tfpy
+from tfpy.NumpyAdapter import random_matrix
+import bson
+import numpy
+import timeit
+
+# Compare the binary matrix encoding of SphericalDesign.to_dict() with the old nested list format.
+
+def legacy_to_dict(design):
+  "The format written by to_dict() before the binary encoding: nested lists of (real, imag) pairs."
+  dct = {'d': design.d, 'n': design.n, 't': design.t, 'field': design.field.value, 'design_type': design.design_type.value, 'error': design.error}
+  if design.field == tfpy.DesignField.COMPLEX:
+    dct['matrix'] = [[(cell.real, cell.imag) for cell in row] for row in design.matrix.tolist()]
+  else:
+    dct['matrix'] = design.matrix.tolist()
+  return dct
+
+rng = numpy.random.default_rng()
+print('field,d,n,format,bson bytes,encode ms,decode ms')
+for field in tfpy.ALL_FIELDS:
+  for d, n in [(3, 6), (4, 40), (10, 1000), (20, 10000)]:
+    design = tfpy.SphericalDesign(d, n, 2, field, tfpy.DesignType.EQUAL_NORM, random_matrix(d, n, field, rng), 0.0)
+    repeat = max(1, 20000//(d*n))
+    for name, to_dict in [('legacy', legacy_to_dict), ('binary', tfpy.SphericalDesign.to_dict)]:
+      encoded = bson.encode(to_dict(design))
+      encode = timeit.timeit(lambda: bson.encode(to_dict(design)), number = repeat)/repeat
+      decode = timeit.timeit(lambda: tfpy.SphericalDesign.from_dict(bson.decode(encoded)), number = repeat)/repeat
+      print(f'{field.value},{d},{n},{name},{len(encoded)},{1000*encode:.3f},{1000*decode:.3f}', flush = True)
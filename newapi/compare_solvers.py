@@ -0,0 +1,30 @@
+import tfpy
+from tfpy.NumpyAdapter import normalise, random_matrix
+import numpy
+import time
+try:
+  import matlab
+except ImportError:
+  matlab = None # The MATLAB API for Python is not installed; only the NumPy solvers are compared.
+
+# The parameters used in test.py.
+parameters = [(3,6,2, tfpy.DesignField.REAL, tfpy.DesignType.EQUAL_NORM),
+              (5,16,2, tfpy.DesignField.REAL, tfpy.DesignType.WEIGHTED),
+              (4,40,3, tfpy.DesignField.COMPLEX, tfpy.DesignType.EQUAL_NORM),
+              (5,5,1, tfpy.DesignField.COMPLEX, tfpy.DesignType.EQUAL_NORM)]
+
+rng = numpy.random.default_rng()
+with tfpy.NumpyAdapter() as na:
+  for d, n, t, field, design_type in parameters:
+    seed = normalise(random_matrix(d, n, field, rng), design_type)
+    design = na.produce_design(d, n, t, field, design_type, seed)
+    print(f'[d = {d},\tn = {n},\tt = {t},\tfield = {field.value:7}, type = {design_type.value:10}] L-BFGS: error {design.error:e} after {na.last_iterations} iterations in {na.last_time:.3f}s', flush = True)
+
+if matlab is not None and hasattr(tfpy, 'MatlabAdapter'):
+  with tfpy.MatlabAdapter(existing = True) as ma:
+    for d, n, t, field, design_type in parameters:
+      start = time.perf_counter()
+      dp = ma.design_parameters(tfpy.SphericalDesign(d, n, t, field, design_type))
+      _, errors, iterations = ma.engine.produce_design(dp, matlab.double(), nargout=3)
+      error = errors if isinstance(errors, float) else errors[0][-1]
+      print(f'[d = {d},\tn = {n},\tt = {t},\tfield = {field.value:7}, type = {design_type.value:10}] Manopt: error {error:e} after {int(iterations)} iterations in {time.perf_counter() - start:.3f}s', flush = True)
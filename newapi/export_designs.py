@@ -0,0 +1,28 @@
+import argparse
+import sys
+
+import tfpy
+
+parser = argparse.ArgumentParser(description='Export stored designs to a single Magma or MATLAB file.')
+parser.add_argument('output', metavar='FILE', help='file to write (- for stdout)')
+parser.add_argument('-l','--language', choices=['magma', 'matlab'], default='magma', help='language to export to (default: magma)')
+parser.add_argument('-s','--store', default=None, help='mongodb:// URI or path of a local store (default: MongoDB on localhost)')
+parser.add_argument('-a','--accuracy', type=int, default=32, help='number of significant digits (default: 32)')
+parser.add_argument('-d', type=int, nargs='+', help='only export these d')
+parser.add_argument('-n', type=int, nargs='+', help='only export these n')
+parser.add_argument('-t', type=int, nargs='+', help='only export these t')
+parser.add_argument('--field', choices=[field.value for field in tfpy.ALL_FIELDS], nargs='+', help='only export these fields')
+parser.add_argument('--type', choices=[design_type.value for design_type in tfpy.ALL_DESIGN_TYPES], nargs='+', help='only export these design types')
+
+args = parser.parse_args()
+search = {key: getattr(args, key) for key in ['d', 'n', 't'] if getattr(args, key) is not None}
+if args.field is not None:
+  search['field'] = [tfpy.DesignField(field) for field in args.field]
+if args.type is not None:
+  search['design_type'] = [tfpy.DesignType(design_type) for design_type in args.type]
+
+with tfpy.open_storage(args.store) as db:
+  with (sys.stdout if args.output == '-' else open(args.output, 'w')) as f:
+    count = tfpy.export_designs(db.search(batch_size = 100, **search), f, args.language, args.accuracy)
+
+print(f'Exported {count} designs.', file = sys.stderr)
@@ -0,0 +1,28 @@
+import re
+import sys
+
+# A stand-in for Magma that understands just enough of the code MagmaAdapter sends to test it without Magma:
+#   python fake_magma.py
+# It runs the print statements of each job, reporting the number n of vectors of the design as the order of its
+# symmetry group, and fails in FrameSymmetry() (like Magma on a bad frame) for designs with n = 7.
+
+n = None
+for line in sys.stdin:
+  line = line.strip()
+  if line == 'quit;':
+    break
+  match = re.match(r'V:=Matrix\(CC,(\d+),(\d+),', line)
+  if match:
+    n = int(match.group(2))
+  elif line.startswith('G := FrameSymmetry') and n == 7:
+    print('Runtime error in FrameSymmetry: bad frame')
+    n = None
+  elif line == 'print #G;':
+    print(n if n is not None else "Runtime error in '#': Bad argument types")
+  elif line == 'print G;':
+    print(f'Permutation group acting on a set of cardinality {n}\n  (1, 2)' if n is not None else 'false')
+  else:
+    match = re.match(r'print "(.*)";', line)
+    if match:
+      print(match.group(1))
+  sys.stdout.flush()
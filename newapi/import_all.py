@@ -1,77 +1,133 @@
-from matlab.engine import MatlabExecutionError
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
+import hashlib
+import json
+import os
 import sys
-import shutil
-from datetime import datetime
+import time
+import numpy
 import numpy.linalg
 
 import tfpy
 
-parser = argparse.ArgumentParser(description='Import many .mat files into one database.')
-parser.add_argument('directory', metavar='DIR', help='directory to scan')
-parser.add_argument('-R','--recursive', action='store_true', help='scan DIR recursively')
-parser.add_argument('-e','--existing', action='count', default=0, help='connect to a running MATLAB session; specify twice to skip MATLAB verification prompt')
-
-args = parser.parse_args()
-search_dir = Path(args.directory)
-if not search_dir.is_dir():
-    sys.exit('Argument is not a directory.')
-
-recurse = (args.recursive == True)
-existing = args.existing
-
-if recurse:
-    mat_files = sorted(list(search_dir.glob('**/*.mat')))
-else:
-    mat_files = sorted(list(search_dir.glob('*.mat')))
-
-# -e but not -ee specified, so print usage and wait for user OK.
-if existing == 1:
-    print('In the running MATLAB session enter the command:\tmatlab.engine.shareEngine')
-    input("Press Enter to continue...")
-
-count = 0
-with tfpy.DatabaseAdapter(collection = 'designs') as db:
-  with tfpy.MatlabAdapter(existing = (existing == 1)) as ma:
-    for f in mat_files:
-      matfile = ma.engine.matfile(str(f.resolve()))
-
-      try:
-        matrix = numpy.array(ma.engine.getfield(matfile,'result'))
-        d = int(ma.engine.getfield(matfile, 'd'))
-        n = int(ma.engine.getfield(matfile, 'n'))
-        t = int(ma.engine.getfield(matfile, 't'))
-        try:
-          error = (ma.engine.getfield(matfile, 'errors'))[0][-1]
-        except TypeError:
-          # Maybe it's a singleton matrix.
-          error = float(ma.engine.getfield(matfile, 'errors'))
-        print(f'Saw {str(f)}\t\tand copying: ',end='',flush=True)
-      except MatlabExecutionError as e:
-        print(f'Saw {str(f)}\t\tNo result array.',flush=True)
-        continue
-
-
-      # Guess field.
-      field = tfpy.DesignField.REAL
-      for row in matrix:
-        for cell in row:
-          if complex(cell).imag > 1e-4:
-            field = tfpy.DesignField.COMPLEX
-
-      if field == tfpy.DesignField.REAL:
-        matrix = numpy.array([[complex(cell).real for cell in row] for row in matrix])
-
-      # Guess type.
-      design_type = tfpy.DesignType.WEIGHTED if ((numpy.linalg.norm(matrix) - 1) <= 1e-4) else tfpy.DesignType.EQUAL_NORM
-
-
-      try:
-        db.insert(tfpy.SphericalDesign(d, n, t, field, design_type, matrix, error))
-        print(f'd = {d}, n = {n}, t={t}, field={field.value}, type={design_type.value}, error={error}',flush=True)
-        count = count + 1
-      except tfpy.DimensionError as e:
-        print(f'broken dimension: {str(e)}, not adding',flush=True)
-
-print(f'Imported {count} files in total.')
+def file_hash(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+# Hashes of the files imported by earlier runs, set in each worker by initialise_worker().
+imported = {}
+
+def initialise_worker(manifest):
+  global imported
+  imported = manifest
+
+def read_design(path):
+  """Read a design from a .mat file written by the MATLAB scripts.
+
+    Returns (path, hash, result), where result is a SphericalDesign, a message saying why the
+    file was not imported, or None if the file was imported by an earlier run.
+  """
+  digest = file_hash(path)
+  if imported.get(path) == digest:
+    return path, digest, None
+
+  try:
+    variables = tfpy.read_mat_variables(path, ['result', 'd', 'n', 't', 'errors'])
+    matrix = numpy.asarray(variables['result'])
+    d, n, t = (int(numpy.asarray(variables[name]).ravel()[0]) for name in ['d', 'n', 't'])
+    error = float(numpy.asarray(variables['errors']).ravel()[-1])
+  except (KeyError, IndexError, ValueError, OSError) as e:
+    return path, digest, f'No result array ({e}).'
+
+  # Guess field.
+  if numpy.iscomplexobj(matrix) and numpy.any(numpy.abs(matrix.imag) > 1e-4):
+    field = tfpy.DesignField.COMPLEX
+  else:
+    field = tfpy.DesignField.REAL
+    matrix = numpy.ascontiguousarray(matrix.real, dtype = float)
+
+  # Guess type.
+  design_type = tfpy.DesignType.WEIGHTED if ((numpy.linalg.norm(matrix) - 1) <= 1e-4) else tfpy.DesignType.EQUAL_NORM
+
+  try:
+    return path, digest, tfpy.SphericalDesign(d, n, t, field, design_type, matrix, error)
+  except tfpy.DimensionError as e:
+    return path, digest, f'broken dimension: {str(e)}, not adding'
+
+def save_manifest(manifest, path):
+  temporary = path.with_name(path.name + '.tmp')
+  with temporary.open('w') as f:
+    json.dump(manifest, f, indent = 1)
+  temporary.replace(path)
+
+def flush_and_save(db, pending, manifest, path):
+  """Write out the designs buffered in db, then add the files they came from to the manifest and save it.
+
+    pending is the list of (path, hash, design) inserted since the last call; it is emptied. Files
+    whose design could not be written (see db.write_errors) are left out, so the next run tries
+    them again.
+  """
+  db.flush()
+  failed = {id(design) for design, _ in db.write_errors}
+  for f, digest, design in pending:
+    if id(design) not in failed:
+      manifest[f] = digest
+  pending.clear()
+  save_manifest(manifest, path)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Import many .mat files into one database.')
+  parser.add_argument('directory', metavar='DIR', help='directory to scan')
+  parser.add_argument('-R','--recursive', action='store_true', help='scan DIR recursively')
+  parser.add_argument('-j','--workers', type=int, default=os.cpu_count(), help='number of processes reading files (default: one per CPU)')
+  parser.add_argument('-s','--store', default=None, help='mongodb:// URI or path of a local store to import into (default: MongoDB on localhost)')
+  parser.add_argument('-m','--manifest', default=None, help='file recording the files already imported (default: DIR/.tfpy_imported.json)')
+  parser.add_argument('-b','--batch-size', type=int, default=500, help='number of designs written at a time')
+
+  args = parser.parse_args()
+  search_dir = Path(args.directory)
+  if not search_dir.is_dir():
+      sys.exit('Argument is not a directory.')
+
+  recurse = (args.recursive == True)
+
+  if recurse:
+      mat_files = sorted(list(search_dir.glob('**/*.mat')))
+  else:
+      mat_files = sorted(list(search_dir.glob('*.mat')))
+
+  manifest_path = Path(args.manifest) if args.manifest is not None else search_dir / '.tfpy_imported.json'
+  try:
+    with manifest_path.open() as f:
+      manifest = json.load(f)
+  except FileNotFoundError:
+    manifest = {}
+
+  count = skipped = 0
+  pending = []
+  start = time.perf_counter()
+  with tfpy.open_storage(args.store, buffer_size = args.batch_size) as db, ProcessPoolExecutor(args.workers, initializer = initialise_worker, initargs = (manifest,)) as pool:
+    try:
+      for i, (f, digest, result) in enumerate(pool.map(read_design, [str(f.resolve()) for f in mat_files], chunksize = 16)):
+        if result is None:
+          skipped = skipped + 1
+        elif isinstance(result, str):
+          print(f'Saw {f}\t\t{result}', flush=True)
+        else:
+          db.insert(result)
+          pending.append((f, digest, result))
+          print(f'Saw {f}\t\tand copying: d = {result.d}, n = {result.n}, t={result.t}, field={result.field.value}, type={result.design_type.value}, error={result.error}', flush=True)
+          count = count + 1
+
+        # Only remember files once their designs are written; files that could not be read are not remembered at all.
+        if (i + 1) % args.batch_size == 0:
+          flush_and_save(db, pending, manifest, manifest_path)
+    finally:
+      flush_and_save(db, pending, manifest, manifest_path)
+
+  elapsed = time.perf_counter() - start
+  print(f'Imported {count - len(db.write_errors)} files in total ({skipped} already imported) in {elapsed:.1f}s: {len(mat_files)/max(elapsed, 1e-9):.1f} files/s.')
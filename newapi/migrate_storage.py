@@ -0,0 +1,28 @@
+import argparse
+import time
+
+import tfpy
+
+parser = argparse.ArgumentParser(description='Copy the designs of one store into another, e.g. from MongoDB into a local store.')
+parser.add_argument('destination', metavar='DEST', help='path of the local store to copy into (or a mongodb:// URI)')
+parser.add_argument('-s','--source', default=None, help='mongodb:// URI or local store to copy from (default: MongoDB on localhost)')
+parser.add_argument('--dbname', default='tfpy', help='MongoDB database name (default: tfpy)')
+parser.add_argument('--collection', default='designs', help='MongoDB collection name (default: designs)')
+parser.add_argument('-b','--batch-size', type=int, default=1000, help='number of designs read and written at a time')
+
+args = parser.parse_args()
+
+def store(location):
+  if location is None or str(location).startswith(('mongodb://', 'mongodb+srv://')):
+    return tfpy.open_storage(location, dbname = args.dbname, collection = args.collection, buffer_size = args.batch_size)
+  return tfpy.open_storage(location, buffer_size = args.batch_size)
+
+start = time.perf_counter()
+with store(args.source) as source:
+  with store(args.destination) as destination:
+    count = tfpy.copy_designs(source, destination, args.batch_size)
+
+elapsed = time.perf_counter() - start
+print(f'Copied {count} designs in {elapsed:.1f}s ({count/max(elapsed, 1e-9):.0f} designs/s).')
+if destination.write_errors:
+  print(f'{len(destination.write_errors)} designs could not be written.')
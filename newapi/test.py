@@ -19,6 +19,9 @@ with tfpy.MatlabAdapter(existing = True) as ma:
   print(f'[Equiangular R^3, equal norm] Norms of vectors: {numpy.array(norms)} ')
   print(f'[Equiangular R^3, equal norm] Gramian:\n{design.gramian} ')
   print(f'[Equiangular R^3, equal norm] Gramian sanity check (should be zero):\n{design.gramian - ma.compute_gramian(design)} ')
+  potential = tfpy.DesignPotential.for_design(design)
+  print(f'[Equiangular R^3, equal norm] Error sanity check (should be zero): {potential.compute_error(design.matrix) - ma.compute_error(design)} ')
+  print(f'[Equiangular R^3, equal norm] Gradient sanity check (should be zero):\n{potential.compute_gradient(design.matrix) - ma.compute_gradient(design)} ')
 
   design = ma.produce_design(5,16,2, tfpy.DesignField.REAL, tfpy.DesignType.WEIGHTED)
   print(f'[2-design in R^5, weighted] Best error: {design.error} ')
@@ -36,6 +39,9 @@ with tfpy.MatlabAdapter(existing = True) as ma:
     norms.append(numpy.linalg.norm(vector))
   print(f'[highly symmetric 3-design in C^4, equal norm] Norms of vectors: {numpy.array(norms)} ')
   print(f'[highly symmetric 3-design in C^4, equal norm] Gramian:\n{design.gramian} ')
+  potential = tfpy.DesignPotential.for_design(design)
+  print(f'[highly symmetric 3-design in C^4, equal norm] Error sanity check (should be zero): {potential.compute_error(design.matrix) - ma.compute_error(design)} ')
+  print(f'[highly symmetric 3-design in C^4, equal norm] Gradient sanity check (should be zero): {numpy.max(numpy.abs(potential.compute_gradient(design.matrix) - ma.compute_gradient(design)))} ')
 
   design = ma.produce_design(5,5,1, tfpy.DesignField.COMPLEX, tfpy.DesignType.EQUAL_NORM)
   print(f'[orthonormal basis in C^5] Best error: {design.error} ')
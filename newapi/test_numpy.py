@@ -0,0 +1,184 @@
+import tfpy
+import tfpy.bounds
+import tfpy.products
+import itertools
+import json
+import numpy
+import sys
+import tempfile
+import threading
+
+# Checks that need neither MATLAB nor a database server; run with `python test_numpy.py` from newapi.
+
+rng = numpy.random.default_rng(0)
+
+def random_matrix(d, n, field):
+  matrix = rng.standard_normal((d, n))
+  if field == tfpy.DesignField.COMPLEX:
+    matrix = matrix + 1j*rng.standard_normal((d, n))
+  return matrix
+
+def baseline_triple_products(vectors):
+  "The loop SphericalDesign.triple_products used before it was blocked: numpy.dot over every triple of rows of vectors."
+  return numpy.array([numpy.dot(u,v)*numpy.dot(v,w)*numpy.dot(w,u) for u,v,w in tfpy.triples(vectors)])
+
+#
+# Triple products. The blocked engine intentionally changed two things from the baseline loop:
+#  1. it takes the vectors of the design to be the COLUMNS of the matrix (the baseline looped over rows), and
+#  2. it uses the conjugate-linear inner product <u,v> = u^H v, as compute_triple_products.m does (the baseline used
+#     the bilinear numpy.dot).
+# So the baseline is run on matrix.T, and on complex designs on matrix.conj().T for the first factor of each dot
+# product, i.e. the baseline loop with numpy.vdot.
+#
+for field in tfpy.ALL_FIELDS:
+  for d, n in [(3, 7), (2, 5), (4, 4)]:
+    matrix = random_matrix(d, n, field)
+    design = tfpy.SphericalDesign(d, n, 2, field, tfpy.DesignType.WEIGHTED, matrix)
+    if field == tfpy.DesignField.REAL:
+      expected = baseline_triple_products(matrix.T)
+    else:
+      expected = numpy.array([numpy.vdot(u,v)*numpy.vdot(v,w)*numpy.vdot(w,u) for u,v,w in tfpy.triples(matrix.T)])
+
+    # Tiny blocks, so that several blocks are needed; concatenated, they are in the (i,j,k) order of the loop.
+    blocks = numpy.concatenate([block.ravel() for block in tfpy.products.triple_product_blocks(design.gramian, max_bytes = 1)])
+    assert numpy.allclose(blocks, expected), f'blocked triple products differ from the baseline loop ({field.value}, {d}x{n})'
+    # Rounded first, so that products with (nearly) equal real parts sort the same way.
+    assert numpy.allclose(numpy.sort(numpy.round(design.triple_products, 10)), numpy.sort(numpy.round(expected, 10))), f'sorted triple products differ from the baseline loop ({field.value}, {d}x{n})'
+
+#
+# Design potential: compare the gradient with central finite differences of the error along random directions. For
+# complex designs the gradient is the egrad on R^(2dn), so the directional derivative along D is Re(sum(conj(grad)*D)).
+#
+for field in tfpy.ALL_FIELDS:
+  for d, n, t in [(2, 4, 2), (3, 6, 2), (3, 5, 3)]:
+    for normalisation_term in (False, True):
+      potential = tfpy.DesignPotential(d, n, t, field, tfpy.DesignType.WEIGHTED, normalisation_term)
+      S = random_matrix(d, n, field)
+      gradient = potential.compute_gradient(S)
+      step = 1e-6
+      for _ in range(5):
+        D = random_matrix(d, n, field)
+        numerical = (potential.compute_error(S + step*D) - potential.compute_error(S - step*D))/(2*step)
+        assert numpy.allclose(numpy.sum(gradient.conj()*D).real, numerical, rtol = 1e-5, atol = 1e-6), \
+          f'gradient differs from finite differences ({field.value}, d = {d}, n = {n}, t = {t}, normalisation_term = {normalisation_term})'
+
+    # Stacks of designs give the same errors and gradients as the designs one at a time.
+    stack = numpy.stack([random_matrix(d, n, field) for _ in range(3)])
+    assert numpy.allclose(potential.compute_error(stack), [potential.compute_error(S) for S in stack])
+    assert numpy.allclose(potential.compute_gradient(stack), [potential.compute_gradient(S) for S in stack])
+
+#
+# Lower bounds on n. Table searches start at lower_bound(), so a bound that is too large would skip values of n where
+# designs exist; check the LP bound against known values, and that it never falls below lower_bound_n().
+#
+assert [tfpy.bounds.lp_bound(3, t, tfpy.DesignField.REAL, cache_file = None) for t in range(1, 7)] == [3, 6, 11, 16, 22, 30]
+assert [tfpy.bounds.lp_bound(4, t, tfpy.DesignField.COMPLEX, cache_file = None) for t in range(1, 7)] == [4, 16, 40, 100, 220, 450]
+for field in tfpy.ALL_FIELDS:
+  for d in range(2, 5):
+    for t in range(1, 5):
+      assert tfpy.bounds.lower_bound(d, t, field) >= tfpy.bounds.lower_bound_n(d, t)
+
+#
+# Serialisation: to_dict() and from_dict() round trip, and the arrays come back writable in both the binary and the
+# old nested list format.
+#
+for field in tfpy.ALL_FIELDS:
+  design = tfpy.SphericalDesign(3, 5, 2, field, tfpy.DesignType.WEIGHTED, random_matrix(3, 5, field), 0.5)
+  design.gramian
+  dct = design.to_dict(cached = True)
+  legacy = dict(dct, matrix = design.matrix.tolist() if field == tfpy.DesignField.REAL else numpy.stack([design.matrix.real, design.matrix.imag], axis = -1).tolist())
+  for restored in (tfpy.SphericalDesign.from_dict(dct), tfpy.SphericalDesign.from_dict(legacy)):
+    assert numpy.array_equal(restored.matrix, design.matrix) and numpy.allclose(restored.gramian, design.gramian)
+    assert restored.matrix.flags.writeable and restored.gramian.flags.writeable, f'from_dict() returned a read-only array ({field.value})'
+    restored.matrix[0, 0] = 0
+
+#
+# The local store (SQLite and a memory-mapped matrix file): write, search, lazy loading, minimal designs and copying.
+#
+with tempfile.TemporaryDirectory() as directory:
+  stored = [tfpy.SphericalDesign(d, n, 2, field, tfpy.DesignType.EQUAL_NORM, random_matrix(d, n, field), error)
+            for d, n, field, error in [(3, 6, tfpy.DesignField.REAL, 1e-12), (3, 5, tfpy.DesignField.REAL, 1e-3), (3, 7, tfpy.DesignField.REAL, 1e-13),
+                                       (2, 4, tfpy.DesignField.COMPLEX, 1e-12), (2, 3, tfpy.DesignField.COMPLEX, 1e-12)]]
+  with tfpy.open_storage(f'{directory}/store') as db:
+    for design in stored:
+      design.dbid = db.insert(design)
+    by_id = {design.dbid: design for design in stored}
+
+    found = list(db.search(d = [3]))
+    assert sorted(design.n for design in found) == [5, 6, 7]
+    for design in found:
+      assert numpy.array_equal(design.matrix, by_id[design.dbid].matrix) and design.error == by_id[design.dbid].error
+
+    lazy = list(db.search(lazy = True))
+    assert len(lazy) == len(stored) and not any(design.loaded for design in lazy)
+    assert numpy.array_equal(lazy[0].matrix, by_id[lazy[0].dbid].matrix) and lazy[0].loaded
+    db.prefetch(lazy)
+    for design in lazy:
+      assert design.loaded and numpy.array_equal(design.matrix, by_id[design.dbid].matrix)
+
+    minimal = list(db.minimal_designs(threshold = 1e-9))
+    assert [(design.d, design.n, design.field) for design in minimal] == [(2, 3, tfpy.DesignField.COMPLEX), (3, 6, tfpy.DesignField.REAL)]
+    assert all(design.matrix is None for design in minimal)
+
+    with tfpy.open_storage(f'{directory}/copy') as copy:
+      assert tfpy.copy_designs(db, copy) == len(stored)
+      copied = sorted(copy.search(), key = lambda design: (design.d, design.n))
+      assert [(design.d, design.n, design.error) for design in copied] == sorted((design.d, design.n, design.error) for design in stored)
+      for design in copied:
+        assert any(numpy.array_equal(design.matrix, original.matrix) for original in stored)
+
+#
+# Resuming a table sweep from its journal. A design counts as handed over only once the next one is asked for, so the
+# last design taken before the sweep stops is produced again on resumption; apart from that, the resumed sweep must
+# carry on at the recorded cell and n, repeating and skipping nothing.
+#
+def sweep(journal, count):
+  generator = tfpy.design_table_generator(2, 1, [tfpy.DesignField.REAL], [tfpy.DesignType.EQUAL_NORM, tfpy.DesignType.WEIGHTED], threshold = 1e-8,
+                                          matlab_adapter = tfpy.NumpyAdapter(seeds = 20, random_state = 0), journal = journal)
+  designs = [(design.d, design.t, design.design_type, design.n) for design in itertools.islice(generator, count)]
+  generator.close()
+  return designs
+
+with tempfile.TemporaryDirectory() as directory:
+  path = f'{directory}/journal.json'
+  expected = sweep(None, 6) # Cells (2,1), (2,2) and (3,1), two design types each.
+
+  first = sweep(path, 3)
+  with open(path) as f:
+    state = json.load(f)
+  assert state['h'] == 1 and state['n'] == {'real/equal_norm': first[-1][3]} and state['finished'] == [], state
+  second = sweep(path, 4)
+  assert second[0] == first[-1], 'the sweep did not resume at the recorded cell and n'
+  assert first[:-1] + second == expected, 'the resumed sweep repeated or lost a design'
+
+  # The recorded n is where the search resumes, even above the lower bound.
+  with open(path) as f:
+    state = json.load(f)
+  state['n'] = {key: n + 1 for key, n in state['n'].items()}
+  with open(path, 'w') as f:
+    json.dump(state, f)
+  assert sweep(path, 1) == [second[-1][:3] + (second[-1][3] + 1,)]
+
+#
+# Magma sessions, with fake_magma.py standing in for Magma: it reports n as the group order, and fails for n = 7.
+#
+def magma_designs(ns):
+  return [tfpy.SphericalDesign(3, n, 2, tfpy.DesignField.REAL, tfpy.DesignType.EQUAL_NORM, random_matrix(3, n, tfpy.DesignField.REAL)) for n in ns]
+
+with tfpy.MagmaAdapter(command = f'{sys.executable} fake_magma.py', preamble = '') as magma:
+  designs = list(magma.symmetries(magma_designs([4, 7, 5])))
+  assert [design.symmetry['order'] for design in designs] == [4, None, 5]
+  assert 'bad frame' in designs[1].symmetry['log']
+
+  # Stop after the first of many jobs: enough that the pipes fill up and the writer blocks, which must not hang
+  # the generator when it is closed, nor leave output behind that is read as the result of the next job.
+  def first_only():
+    for design in magma.symmetries(magma_designs([6]*2000)):
+      return design.symmetry['order']
+  thread = threading.Thread(target = first_only, daemon = True)
+  thread.start()
+  thread.join(timeout = 60)
+  assert not thread.is_alive(), 'closing MagmaAdapter.symmetries() early hangs'
+  assert magma.symmetry(magma_designs([8])[0])['order'] == 8
+
+print('All checks passed.')
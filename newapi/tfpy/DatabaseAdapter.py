@@ -1,64 +1,252 @@
-from pymongo import MongoClient
-from copy import deepcopy
+from pymongo import MongoClient, ASCENDING, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+import time
+import warnings
 import tfpy.base
+from tfpy.storage import StorageAdapter, LazySphericalDesign
 
-class DatabaseAdapter(object):
+class DatabaseAdapter(StorageAdapter):
   """Encapsulate the database API.
 
-    This class is a context manager that interfaces with a database layer, enabling
-    storage and retrieval of spherical designs.
+    This class is a context manager that interfaces with a MongoDB server, enabling
+    storage and retrieval of spherical designs. See tfpy.storage for the interface it shares
+    with the server-free tfpy.LocalDatabaseAdapter.
+
+    Writes can be buffered: with buffer_size or flush_interval set, insert(), upsert_if_better()
+    and record_failure() queue their operation, and the queue is sent as unordered bulk writes
+    once it holds buffer_size operations, once flush_interval seconds have passed since the last
+    flush, before any read, and on leaving the context. Operations that the server rejects are
+    reported by a warning and collected in write_errors.
 
   """
-  def __init__(self, dbname = 'tfpy', collection = 'designs'):
+  def __init__(self, dbname = 'tfpy', collection = 'designs', failures_collection = 'failures', buffer_size = None, flush_interval = None, host = None):
+    """
+      Parameters: dbname, collection, failures_collection -- names of the MongoDB database and collections
+                  host -- hostname or mongodb:// URI of the server (default: localhost)
+                  buffer_size -- number of writes to buffer before flushing (optional)
+                  flush_interval -- seconds after which buffered writes are flushed (optional)
+    """
     self._client = None
     self._db = None
     self._designs = None
+    self._failures = None
 
     self._dbname = dbname
     self._collection = collection
-    pass
+    self._failures_collection = failures_collection
+    self._host = host
+
+    self.buffer_size = buffer_size
+    self.flush_interval = flush_interval
+    self.write_errors = []
+    self._buffer = []
+    self._last_flush = time.monotonic()
+
+  # Compound index serving searches by parameters and the sort in minimal_designs().
+  DESIGN_INDEX = [('d', ASCENDING), ('t', ASCENDING), ('field', ASCENDING), ('design_type', ASCENDING), ('n', ASCENDING), ('error', ASCENDING)]
+  FAILURE_INDEX = [('d', ASCENDING), ('n', ASCENDING), ('t', ASCENDING), ('field', ASCENDING), ('design_type', ASCENDING)]
+  # Fields of a design other than its arrays, kept by minimal_designs() when only metadata is wanted.
+  METADATA_FIELDS = ('d', 'n', 't', 'field', 'design_type', 'error', 'symmetry')
+
+  # (host, database, collection) triples whose indexes have been created by this process.
+  _indexed = set()
 
   def __enter__(self):
-    self._client = MongoClient()
+    self._client = MongoClient(self._host)
     self._db = self._client[self._dbname]
     self._designs = self._db[self._collection]
+    self._failures = self._db[self._failures_collection]
+    self.ensure_indexes()
     return self
 
+  def ensure_indexes(self):
+    "Create the indexes on the designs and failures collections, once per process (it is a no-op if they exist)."
+    for collection, index in [(self._designs, self.DESIGN_INDEX), (self._failures, self.FAILURE_INDEX)]:
+      key = (self._host, self._dbname, collection.name)
+      if key not in DatabaseAdapter._indexed:
+        collection.create_index(index)
+        DatabaseAdapter._indexed.add(key)
+
   def __exit__(self, exc_type, exc_value, traceback):
-    pass
+    self.flush()
+
+  @property
+  def buffered(self):
+    return self.buffer_size is not None or self.flush_interval is not None
+
+  def _write(self, collection, operation, design):
+    "Perform a write operation now, or queue it if writes are buffered; design is used in error reports."
+    if not self.buffered:
+      return collection.bulk_write([operation])
+    self._buffer.append((collection, operation, design))
+    if (self.buffer_size is not None and len(self._buffer) >= self.buffer_size) or \
+       (self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+      self.flush()
+    return None
 
-  def search(self, **kwargs):
-    prototype_designs = [{}]
+  def flush(self):
+    """Send all buffered writes to the server, one unordered bulk write per collection.
 
-    def set_theoretic_product(st, key, values):
-      scratch = []
-      for v in values:
-        for s in st:
-          t = deepcopy(s)
-          t[key] = v
-          scratch.append(t)
-      return scratch
+      Returns the list of errors of this flush: (design, error document) pairs, where the error
+      document is the server's writeError (with 'code' and 'errmsg'). They are also appended to
+      write_errors.
+    """
+    buffer, self._buffer = self._buffer, []
+    self._last_flush = time.monotonic()
 
+    errors = []
+    for collection in {id(collection): collection for collection, _, _ in buffer}.values():
+      writes = [(operation, design) for c, operation, design in buffer if c is collection]
+      try:
+        collection.bulk_write([operation for operation, _ in writes], ordered = False)
+      except BulkWriteError as e:
+        errors += [(writes[error['index']][1], error) for error in e.details['writeErrors']]
+
+    for design, error in errors:
+      warnings.warn(f'Could not store the ({design.d},{design.n},{design.t}) {design.field.value} {design.design_type.value} design: {error.get("errmsg")}')
+    self.write_errors += errors
+    return errors
+
+  @staticmethod
+  def _query(**kwargs):
+    "Return a MongoDB filter matching any of the given values of d, n, t, field and design_type."
+    query = {}
     for key in ['d','n','t']:
       if key in kwargs:
-        prototype_designs = set_theoretic_product(prototype_designs, key, kwargs[key])
+        query[key] = {'$in': [int(v) for v in kwargs[key]]}
     for key in ['field', 'design_type']:
       if key in kwargs:
-        prototype_designs = set_theoretic_product(prototype_designs, key, [v.value for v in kwargs[key]])
-
-    designs = []
-    for prototype_design in prototype_designs:
-      for design_dict in self._designs.find(prototype_design):
-        design = tfpy.base.SphericalDesign.from_dict(design_dict)
-        design.dbid = design_dict['_id']
-        designs.append(design)
+        query[key] = {'$in': [v.value for v in kwargs[key]]}
+    return query
+
+  def search(self, metadata_only = False, projection = None, batch_size = None, lazy = False, **kwargs):
+    """Return an iterator over the stored designs whose parameters take any of the given values.
+
+      The search is a single query, and designs are decoded lazily as the cursor is read.
+
+      Parameters:
+        d, n, t -- lists of values of the numerical parameters (optional; default: any)
+        field, design_type -- lists of tfpy.DesignField and tfpy.DesignType values (optional)
+        metadata_only -- leave out the matrix, gramian and triple products (the designs then
+                         have matrix None; error and the parameters are still set)
+        projection -- a MongoDB projection to use instead, e.g. {'matrix': False}
+        batch_size -- number of documents fetched from the server at a time
+        lazy -- return LazySphericalDesign proxies that fetch their matrices when first used
+    """
+    self.flush()
+    if lazy or (projection is None and metadata_only):
+      projection = {key: False for key in self.MATRIX_FIELDS}
+    cursor = self._designs.find(self._query(**kwargs), projection)
+    if batch_size is not None:
+      cursor = cursor.batch_size(batch_size)
+
+    for design_dict in cursor:
+      yield self._design(design_dict, lazy)
+
+  def _design(self, design_dict, lazy):
+    if lazy:
+      return LazySphericalDesign.from_document(self, design_dict)
+    design = tfpy.base.SphericalDesign.from_dict(design_dict)
+    design.dbid = design_dict['_id']
+    return design
+
+  def prefetch(self, designs, batch_size = 1000):
+    """Load the matrices of every LazySphericalDesign in designs that has not been loaded yet.
+
+      One query is made per batch_size proxies. Proxies of designs deleted since they were found
+      are left unloaded (reading their matrix raises KeyError). Returns designs, so that a list of
+      proxies can be prefetched as it is built, e.g. db.prefetch(list(db.search(lazy = True, d = [3]))).
+    """
+    pending = [design for design in designs if isinstance(design, LazySphericalDesign) and not design.loaded]
+    for start in range(0, len(pending), batch_size):
+      batch = {design.dbid: design for design in pending[start:start + batch_size]}
+      for design_dict in self._designs.find({'_id': {'$in': list(batch)}}):
+        batch.pop(design_dict['_id']).load(design_dict)
     return designs
 
+  def minimal_designs(self, threshold = None, group_by = ('d', 't', 'field', 'design_type'), metadata_only = True, lazy = False, **kwargs):
+    """Return the best design in each group of stored designs, computed by an aggregation on the server.
+
+      Designs are grouped by the keys in group_by, and in each group the design with the smallest
+      n (and, among those, the smallest error) is returned; the results come sorted by group_by.
+      The default finds the minimal designs of the table, e.g. for format_table.py; grouping by
+      ('n',) with d and t given finds the best error for each n instead.
+
+      Parameters:
+        threshold -- only consider designs with error below this (optional)
+        group_by -- names of the parameters to group by
+        metadata_only, lazy -- as for search()
+        d, n, t, field, design_type -- restrict to these parameters, as for search()
+    """
+    self.flush()
+    match = self._query(**kwargs)
+    if threshold is not None:
+      match['error'] = {'$lt': threshold}
+
+    # Sort by the group keys in the order of DESIGN_INDEX, then by n and error, so that the sort can
+    # use the index whatever the order of group_by (the default groups are a prefix of it).
+    index_keys = [key for key, _ in self.DESIGN_INDEX]
+    keys = sorted(group_by, key = lambda key: index_keys.index(key) if key in index_keys else len(index_keys))
+    keys += [key for key in ('n', 'error') if key not in keys]
+
+    pipeline = [{'$match': match}]
+    if metadata_only or lazy:
+      pipeline.append({'$project': {key: True for key in self.METADATA_FIELDS}})
+    pipeline += [{'$sort': {key: ASCENDING for key in keys}},
+                 {'$group': {'_id': {key: '$' + key for key in group_by}, 'design': {'$first': '$$ROOT'}}},
+                 {'$replaceRoot': {'newRoot': '$design'}},
+                 {'$sort': {key: ASCENDING for key in group_by}}]
+
+    for design_dict in self._designs.aggregate(pipeline, allowDiskUse = True):
+      yield self._design(design_dict, lazy)
+
   def insert(self, design):
-    return self._designs.insert_one(design.to_dict()).inserted_id
+    "Store a design and return its id (assigned before the write, so it is known even if the write is buffered)."
+    dct = design.to_dict()
+    dct['_id'] = ObjectId()
+    self._write(self._designs, InsertOne(dct), design)
+    return dct['_id']
+
+  def upsert_if_better(self, design):
+    """Store a design unless a design with the same parameters and no larger error is stored.
+
+      The comparison happens on the server, in a single update with upsert, so that only the
+      lowest-error design per (d, n, t, field, design_type) is kept without reading it first.
+      (This keeps one document per set of parameters; older duplicates are left alone.)
+    """
+    dct = design.to_dict()
+    better = {'$lt': [design.error, {'$ifNull': ['$error', float('inf')]}]}
+    # Every field of the new design is set, and derived fields it lacks are removed, if it is
+    # better; otherwise every field keeps its value. All conditions see the stored document.
+    fields = {key: {'$literal': value} for key, value in dct.items()}
+    fields.update({key: '$$REMOVE' for key in self.MATRIX_FIELDS if key not in dct})
+    update = [{'$set': {key: {'$cond': [better, value, '$' + key]} for key, value in fields.items()}}]
+    return self._write(self._designs, UpdateOne(self._parameter_key(design.d, design.n, design.t, design.field, design.design_type), update, upsert = True), design)
 
   def update(self, dbid, design):
+    self.flush()
     return self._designs.replace_one({"_id": dbid},design.to_dict())
 
   def delete(self, dbid):
+    self.flush()
     return self._designs.delete_one({"_id": dbid})
+
+  @staticmethod
+  def _parameter_key(d, n, t, field, design_type):
+    return {'d': int(d), 'n': int(n), 't': int(t), 'field': field.value, 'design_type': design_type.value}
+
+  def record_failure(self, design):
+    """Record an attempt at the design's parameters that did not meet the caller's threshold.
+
+      The failures collection keeps, per (d, n, t, field, design_type), the best error seen, the
+      number of attempts and the time of the latest attempt.
+    """
+    return self._write(self._failures, UpdateOne(self._parameter_key(design.d, design.n, design.t, design.field, design.design_type),
+                                                 {'$min': {'error': design.error}, '$inc': {'attempts': 1}, '$set': {'time': time.time()}},
+                                                 upsert = True), design)
+
+  def find_failure(self, d, n, t, field, design_type):
+    "Return the failure record for the given parameters (a dict with error, attempts and time) or None."
+    self.flush()
+    return self._failures.find_one(self._parameter_key(d, n, t, field, design_type))
@@ -0,0 +1,247 @@
+import numpy
+import os
+import pathlib
+import sqlite3
+import time
+import tfpy.base
+from tfpy.storage import StorageAdapter, LazySphericalDesign
+
+class LocalDatabaseAdapter(StorageAdapter):
+  """A design store kept in local files, with no database server.
+
+    The parameters and error of each design are rows of an SQLite database at path, with the same
+    compound index as tfpy.DatabaseAdapter; the matrices are appended, as raw little-endian
+    bytes, to the file path + '.matrices', which is memory-mapped for reading. Designs read from
+    the store therefore need no deserialisation: their matrices are read-only views of the map.
+
+    The matrix file is append-only: update() appends the new matrix and delete() only removes the
+    row, so the space of replaced matrices is reclaimed by copying the store into a new one with
+    tfpy.storage.copy_designs(). The Gramian and 3-products are not stored.
+
+    Several processes may read the same store at once; writers take turns, since every write
+    transaction holds the SQLite write lock. Writes are committed at once unless buffer_size or
+    flush_interval is given, in which case they are committed in batches as by DatabaseAdapter.
+
+  """
+  SCHEMA = """
+    CREATE TABLE IF NOT EXISTS designs (id INTEGER PRIMARY KEY, d INTEGER NOT NULL, n INTEGER NOT NULL, t INTEGER NOT NULL,
+                                        field TEXT NOT NULL, design_type TEXT NOT NULL, error REAL,
+                                        dtype TEXT, offset INTEGER, nbytes INTEGER);
+    CREATE INDEX IF NOT EXISTS designs_parameters ON designs (d, t, field, design_type, n, error);
+    CREATE TABLE IF NOT EXISTS failures (d INTEGER, n INTEGER, t INTEGER, field TEXT, design_type TEXT,
+                                         error REAL, attempts INTEGER, time REAL,
+                                         PRIMARY KEY (d, n, t, field, design_type));
+  """
+
+  # Matrices start at multiples of this many bytes, so that every dtype is aligned in the map.
+  ALIGNMENT = 16
+
+  def __init__(self, path, buffer_size = None, flush_interval = None):
+    """
+      Parameters: path -- the SQLite file; it and the matrix file are created if they do not exist
+                  buffer_size -- number of writes to commit at once (optional)
+                  flush_interval -- seconds after which pending writes are committed (optional)
+    """
+    self.path = pathlib.Path(path)
+    self.matrix_path = self.path.with_name(self.path.name + '.matrices')
+    self.buffer_size = buffer_size
+    self.flush_interval = flush_interval
+    self.write_errors = []
+
+    self._connection = None
+    self._matrices = None
+    self._map = None
+    self._pending = 0
+    self._last_flush = time.monotonic()
+
+  def __enter__(self):
+    self.path.parent.mkdir(parents = True, exist_ok = True)
+    self._connection = sqlite3.connect(self.path, isolation_level = None, timeout = 60)
+    self._connection.executescript(self.SCHEMA)
+    self._matrices = open(self.matrix_path, 'ab', buffering = 0)
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.flush()
+    self._map = None
+    self._matrices.close()
+    self._connection.close()
+
+  # Writing.
+
+  def _begin(self):
+    if not self._connection.in_transaction:
+      self._connection.execute('BEGIN IMMEDIATE')
+
+  def _written(self):
+    self._pending = self._pending + 1
+    if (self.buffer_size is None and self.flush_interval is None) or \
+       (self.buffer_size is not None and self._pending >= self.buffer_size) or \
+       (self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval):
+      self.flush()
+
+  def flush(self):
+    "Commit the pending writes, after making sure that their matrices are on disk."
+    if self._connection.in_transaction:
+      os.fsync(self._matrices.fileno())
+      self._connection.execute('COMMIT')
+    self._pending = 0
+    self._last_flush = time.monotonic()
+
+  def _append(self, matrix):
+    "Append a matrix to the matrix file and return (dtype, offset, nbytes); the caller holds the write lock."
+    if matrix is None:
+      return None, None, None
+    matrix = numpy.ascontiguousarray(matrix)
+    dtype = matrix.dtype.newbyteorder('<')
+    data = matrix.astype(dtype, copy = False).tobytes()
+    end = self._matrices.seek(0, os.SEEK_END)
+    padding = -end % self.ALIGNMENT
+    self._matrices.write(bytes(padding) + data)
+    return dtype.str, end + padding, len(data)
+
+  @staticmethod
+  def _row(design):
+    return (design.d, design.n, design.t, design.field.value, design.design_type.value, design.error)
+
+  def _insert(self, design):
+    return self._connection.execute('INSERT INTO designs (d, n, t, field, design_type, error, dtype, offset, nbytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    self._row(design) + self._append(design.matrix)).lastrowid
+
+  def _update(self, dbid, design):
+    self._connection.execute('UPDATE designs SET d = ?, n = ?, t = ?, field = ?, design_type = ?, error = ?, dtype = ?, offset = ?, nbytes = ? WHERE id = ?',
+                             self._row(design) + self._append(design.matrix) + (dbid,))
+
+  def insert(self, design):
+    self._begin()
+    dbid = self._insert(design)
+    self._written()
+    return dbid
+
+  def update(self, dbid, design):
+    self._begin()
+    self._update(dbid, design)
+    self._written()
+
+  def delete(self, dbid):
+    self._begin()
+    self._connection.execute('DELETE FROM designs WHERE id = ?', (dbid,))
+    self._written()
+
+  def upsert_if_better(self, design):
+    """Store a design unless a design with the same parameters and no larger error is stored.
+
+      If a worse design is stored, it is replaced. Returns the dbid written to, or None.
+    """
+    self._begin()
+    stored = self._connection.execute('SELECT id, error FROM designs WHERE d = ? AND n = ? AND t = ? AND field = ? AND design_type = ? ORDER BY error IS NULL, error LIMIT 1',
+                                      self._row(design)[:5]).fetchone()
+    if stored is not None and stored[1] is not None and stored[1] <= design.error:
+      dbid = None
+    elif stored is not None:
+      dbid = stored[0]
+      self._update(dbid, design)
+    else:
+      dbid = self._insert(design)
+    self._written()
+    return dbid
+
+  def record_failure(self, design):
+    """Record an attempt at the design's parameters that did not meet the caller's threshold.
+
+      As for DatabaseAdapter, the best error, the number of attempts and the time of the latest
+      attempt are kept per set of parameters.
+    """
+    self._begin()
+    self._connection.execute('''INSERT INTO failures (d, n, t, field, design_type, error, attempts, time) VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                                ON CONFLICT (d, n, t, field, design_type)
+                                DO UPDATE SET error = min(error, excluded.error), attempts = attempts + 1, time = excluded.time''',
+                             self._row(design) + (time.time(),))
+    self._written()
+
+  # Reading.
+
+  def find_failure(self, d, n, t, field, design_type):
+    row = self._connection.execute('SELECT error, attempts, time FROM failures WHERE d = ? AND n = ? AND t = ? AND field = ? AND design_type = ?',
+                                   (int(d), int(n), int(t), field.value, design_type.value)).fetchone()
+    return None if row is None else {'error': row[0], 'attempts': row[1], 'time': row[2]}
+
+  def _matrix(self, dtype, offset, nbytes, shape):
+    "Return a read-only view of a stored matrix in the memory map, remapping the file if it has grown."
+    if dtype is None:
+      return None
+    if self._map is None or len(self._map) < offset + nbytes:
+      self._map = numpy.memmap(self.matrix_path, dtype = numpy.uint8, mode = 'r')
+    return numpy.ndarray(shape, numpy.dtype(dtype), buffer = self._map, offset = offset)
+
+  @staticmethod
+  def _where(threshold = None, **kwargs):
+    "Return an SQL condition matching any of the given values of the parameters, and its arguments."
+    conditions, arguments = ['1'], []
+    for key in ['d', 'n', 't']:
+      if key in kwargs:
+        values = [int(v) for v in kwargs[key]]
+        conditions.append(f'{key} IN ({",".join("?"*len(values))})')
+        arguments += values
+    for key in ['field', 'design_type']:
+      if key in kwargs:
+        values = [v.value for v in kwargs[key]]
+        conditions.append(f'{key} IN ({",".join("?"*len(values))})')
+        arguments += values
+    if threshold is not None:
+      conditions.append('error < ?')
+      arguments.append(threshold)
+    return ' AND '.join(conditions), arguments
+
+  _COLUMNS = 'id, d, n, t, field, design_type, error, dtype, offset, nbytes'
+
+  def _yield_designs(self, cursor, metadata_only, lazy, batch_size):
+    while True:
+      rows = cursor.fetchmany(batch_size or 1000)
+      if not rows:
+        return
+      for dbid, d, n, t, field, design_type, error, dtype, offset, nbytes in rows:
+        field, design_type = tfpy.base.DesignField(field), tfpy.base.DesignType(design_type)
+        if lazy:
+          yield LazySphericalDesign(self, dbid, d, n, t, field, design_type, error)
+          continue
+        matrix = None if metadata_only else self._matrix(dtype, offset, nbytes, (d, n))
+        design = tfpy.base.SphericalDesign(d, n, t, field, design_type, matrix, error)
+        design.dbid = dbid
+        yield design
+
+  def search(self, metadata_only = False, projection = None, batch_size = None, lazy = False, **kwargs):
+    """Return an iterator over the stored designs whose parameters take any of the given values.
+
+      The parameters are as for DatabaseAdapter.search(); a projection that excludes 'matrix'
+      is taken to mean metadata_only, and other projections are ignored.
+    """
+    if projection is not None and not projection.get('matrix', True):
+      metadata_only = True
+    where, arguments = self._where(**kwargs)
+    return self._yield_designs(self._connection.execute(f'SELECT {self._COLUMNS} FROM designs WHERE {where}', arguments), metadata_only, lazy, batch_size)
+
+  def minimal_designs(self, threshold = None, group_by = ('d', 't', 'field', 'design_type'), metadata_only = True, lazy = False, **kwargs):
+    "Return the best design in each group of stored designs, as for DatabaseAdapter.minimal_designs()."
+    if not set(group_by) <= {'d', 'n', 't', 'field', 'design_type'}:
+      raise ValueError(f'Cannot group designs by {group_by}.')
+    where, arguments = self._where(threshold, **kwargs)
+    groups = ', '.join(group_by)
+    cursor = self._connection.execute(f'''SELECT {self._COLUMNS} FROM
+                                            (SELECT *, row_number() OVER (PARTITION BY {groups} ORDER BY n, error) AS rank FROM designs WHERE {where})
+                                          WHERE rank = 1 ORDER BY {groups}''', arguments)
+    return self._yield_designs(cursor, metadata_only, lazy, None)
+
+  def prefetch(self, designs, batch_size = 1000):
+    "Load the matrices of the LazySphericalDesigns in designs that have not been loaded yet (skipping any no longer stored), and return designs."
+    pending = [design for design in designs if isinstance(design, LazySphericalDesign) and not design.loaded]
+    for start in range(0, len(pending), batch_size):
+      batch = {design.dbid: design for design in pending[start:start + batch_size]}
+      rows = self._connection.execute(f'SELECT id, dtype, offset, nbytes FROM designs WHERE id IN ({",".join("?"*len(batch))})', list(batch))
+      for dbid, dtype, offset, nbytes in rows:
+        design = batch.pop(dbid)
+        if dtype is None:
+          design.load({}) # Stored without a matrix.
+        else:
+          design.matrix = self._matrix(dtype, offset, nbytes, (design.d, design.n))
+    return designs
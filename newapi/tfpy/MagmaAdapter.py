@@ -0,0 +1,237 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import queue
+import shlex
+import subprocess
+import threading
+import tfpy.base
+
+class MagmaError(tfpy.base.TFError):
+  """Exception raised when a Magma session ends or cannot be started."""
+  def __init__(self, message, output = ''):
+    self.message = message
+    self.output = output
+
+  def __str__(self):
+    return f'MagmaError: {self.message}' + (f'\nLast output:\n{self.output}' if self.output else '')
+
+# Loaded once at the start of each session.
+MAGMA_PREAMBLE = """load "ComputeSymmetry.magma";
+Attach("FrameSymmetry.m");
+"""
+
+# Format string for SphericalDesign.to_magma_code() computing the symmetry group G of a design.
+MAGMA_JOB_FORMAT = """G := false;
+CC<i> := {field_name}({accuracy});
+
+V:=Matrix(CC,{d},{n},
+{matrix_rows}
+);
+
+G := FrameSymmetry(CanonicalGramian(V));
+"""
+
+class MagmaAdapter(object):
+  """Encapsulate a long-lived Magma process, local or on a remote host, that computes symmetry groups.
+
+    Each design becomes one job: the code of SphericalDesign.to_magma_code() (with
+    MAGMA_JOB_FORMAT) followed by statements printing #G and G between delimiter lines. Jobs
+    are streamed to the process's standard input by a writer thread while the results are read
+    back, so the interpreter and (for a remote host) the SSH connection are only started once.
+
+    This class is a context manager. Any program that reads Magma statements on standard input
+    can stand in for Magma, e.g. for testing: MagmaAdapter(command = 'python3 fake_magma.py').
+    If the caller stops iterating over symmetries() early, the process is killed and a new
+    session is started with the next job.
+
+  """
+  _BEGIN = '<<<TFPY-BEGIN'
+  _ORDER = '<<<TFPY-ORDER>>>'
+  _GROUP = '<<<TFPY-GROUP>>>'
+  _END = '<<<TFPY-END'
+
+  def __init__(self, host = None, command = 'magma -b', directory = None, preamble = MAGMA_PREAMBLE, accuracy = 32, ssh_command = ('ssh', '-T')):
+    """
+      Parameters: host -- run Magma on this host over SSH (default: locally)
+                  command -- command line starting Magma
+                  directory -- working directory of Magma, where ComputeSymmetry.magma and FrameSymmetry.m are
+                  preamble -- Magma code run once when the session starts
+                  accuracy -- number of digits of the matrices sent to Magma
+                  ssh_command -- command line of the SSH client, without the host
+    """
+    self.host = host
+    self.command = command
+    self.directory = directory
+    self.preamble = preamble
+    self.accuracy = accuracy
+    self.ssh_command = ssh_command
+    self._process = None
+    self._jobs = 0
+
+  def __enter__(self):
+    self._start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if self._process is None:
+      return False
+    try:
+      self._process.stdin.write('quit;\n')
+      self._process.stdin.close()
+    except OSError:
+      pass
+    try:
+      self._process.wait(timeout = 10)
+    except subprocess.TimeoutExpired:
+      self._process.kill()
+    return False
+
+  def _start(self):
+    if self.host is None:
+      self._process = subprocess.Popen(shlex.split(self.command), cwd = self.directory, stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+                                       stderr = subprocess.STDOUT, text = True, bufsize = 1)
+    else:
+      remote = self.command if self.directory is None else f'cd {shlex.quote(str(self.directory))} && {self.command}'
+      self._process = subprocess.Popen(list(self.ssh_command) + [self.host, remote], stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+                                       stderr = subprocess.STDOUT, text = True, bufsize = 1)
+
+    # Wait for the preamble to finish, so that errors in it are reported here.
+    self._write(self.preamble + self._delimiters(0, ''))
+    self._read_job(0)
+
+  def _kill(self):
+    "End the process at once, discarding whatever it has not yet read or printed; the next job starts a new session."
+    self._process.kill()
+    self._process.wait()
+    for pipe in (self._process.stdin, self._process.stdout):
+      with contextlib.suppress(OSError):
+        pipe.close()
+    self._process = None
+
+  def _write(self, code):
+    self._process.stdin.write(code)
+    self._process.stdin.flush()
+
+  def _delimiters(self, job, body):
+    return f'print "{self._BEGIN} {job}>>>";\n{body}print "{self._END} {job}>>>";\n'
+
+  def _job(self, job, design):
+    results = f'print "{self._ORDER}";\nprint #G;\nprint "{self._GROUP}";\nprint G;\n'
+    return self._delimiters(job, design.to_magma_code(self.accuracy, MAGMA_JOB_FORMAT) + results)
+
+  def _read_job(self, job):
+    "Return the lines printed between the delimiters of a job."
+    begin, end = f'{self._BEGIN} {job}>>>', f'{self._END} {job}>>>'
+    lines, started = [], False
+    for line in self._process.stdout:
+      line = line.rstrip('\n')
+      if line == end:
+        return lines
+      elif started:
+        lines.append(line)
+      elif line == begin:
+        started = True
+      else:
+        lines.append(line) # Output of the process before the job started, e.g. a startup error.
+    raise MagmaError('Magma exited unexpectedly.', '\n'.join(lines[-20:]))
+
+  @classmethod
+  def _parse(cls, lines):
+    "Return the symmetry dictionary (order, group and log) of the output of a job."
+    symmetry = {'order': None, 'group': None, 'log': ''}
+    if cls._ORDER in lines and cls._GROUP in lines:
+      order, group = lines.index(cls._ORDER), lines.index(cls._GROUP)
+      symmetry['log'] = '\n'.join(lines[:order])
+      try:
+        symmetry['order'] = int(''.join(lines[order + 1:group]).replace('\\', '').strip())
+        symmetry['group'] = '\n'.join(lines[group + 1:]).strip()
+      except ValueError:
+        symmetry['log'] = '\n'.join(lines)
+    else:
+      symmetry['log'] = '\n'.join(lines)
+    return symmetry
+
+  def symmetries(self, designs):
+    """Compute the symmetry group of every design in designs, yielding the designs in order as they are done.
+
+      Each design gets a symmetry attribute: a dictionary with the group order, the group as
+      printed by Magma, and the rest of Magma's output (the log). If FrameSymmetry() fails, the
+      order and group are None and the log holds the error.
+    """
+    designs = list(designs)
+    if self._process is None:
+      self._start()
+    first = self._jobs + 1
+    self._jobs = self._jobs + len(designs)
+    failure = []
+    done = 0
+
+    def writer():
+      try:
+        for job, design in enumerate(designs, first):
+          self._write(self._job(job, design))
+      except (OSError, ValueError) as e:
+        failure.append(e) # The reader sees the end of the output and reports it.
+
+    thread = threading.Thread(target = writer, daemon = True)
+    thread.start()
+    try:
+      for job, design in enumerate(designs, first):
+        design.symmetry = self._parse(self._read_job(job))
+        done = done + 1
+        yield design
+    finally:
+      if done < len(designs):
+        # Stopped early (or Magma failed): the writer may be blocked on a full pipe, and the output of the
+        # remaining jobs would be read as part of the next one, so the session is abandoned.
+        self._kill()
+      thread.join()
+
+  def symmetry(self, design):
+    "Compute the symmetry group of a single design, and return its symmetry dictionary."
+    for design in self.symmetries([design]):
+      return design.symmetry
+
+class MagmaPool(object):
+  """A pool of Magma sessions (see MagmaAdapter) sharing out batches of designs.
+
+    This class is a context manager; all sessions are started on entry.
+
+  """
+  def __init__(self, sessions = 4, batch_size = 16, **kwargs):
+    """
+      Parameters: sessions -- number of Magma processes
+                  batch_size -- number of designs sent to a session at a time
+                  kwargs -- passed on to MagmaAdapter (host, command, directory, ...)
+    """
+    self.sessions = sessions
+    self.batch_size = batch_size
+    self._adapters = [MagmaAdapter(**kwargs) for _ in range(sessions)]
+    self._idle = queue.Queue()
+    self._stack = None
+    self._executor = None
+
+  def __enter__(self):
+    with contextlib.ExitStack() as stack:
+      for adapter in self._adapters:
+        self._idle.put(stack.enter_context(adapter))
+      self._executor = stack.enter_context(ThreadPoolExecutor(self.sessions))
+      self._stack = stack.pop_all()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    return self._stack.__exit__(exc_type, exc_value, traceback)
+
+  def _run(self, batch):
+    adapter = self._idle.get()
+    try:
+      return list(adapter.symmetries(batch))
+    finally:
+      self._idle.put(adapter)
+
+  def symmetries(self, designs):
+    "Compute the symmetry groups of designs on all sessions at once, yielding the designs in order (see MagmaAdapter.symmetries())."
+    designs = list(designs)
+    batches = [designs[start:start + self.batch_size] for start in range(0, len(designs), self.batch_size)]
+    for batch in self._executor.map(self._run, batches):
+      yield from batch
@@ -5,6 +5,29 @@ matlab_dir = pathlib.Path(__file__).absolute().parent.parent / "matlab"
 
 import tfpy.base
 import numpy
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import queue
+
+def produce_design_on_engine(engine, d, n, t, field, design_type, seed = None):
+  """Run produce_design.m on the given MATLAB engine, starting from the d x n matrix seed if given.
+
+    Returns the result as a SphericalDesign, and the number of iterations Manopt performed.
+  """
+  dp = engine.DesignParameters(matlab.double([d]), matlab.double([n]), matlab.double([t]), field.value, design_type.value)
+  A = matlab.double() if seed is None else matlab.double(seed.tolist(), is_complex = numpy.iscomplexobj(seed))
+  design, errors, iterations = engine.produce_design(dp, A, nargout=3, background=True).result()
+
+  # Sometimes the MATLAB code produces a singleton array for the errors, which is interpreted
+  # by the Python-MATLAB library as a double rather than as a 1x1 matrix.
+  if isinstance(errors, float):
+    errors = [[errors]]
+
+  # Same as above - if the design is of one vector in 1D, we need to manually make it back into a matrix.
+  if isinstance(design, float) or isinstance(design, complex):
+    design = [[design]]
+
+  return tfpy.base.SphericalDesign(d, n, t, field, design_type, numpy.array(design), errors[0][-1]), int(iterations)
 
 class MatlabAdapter(object):
   """Encapsulate the MATLAB API for Python use.
@@ -54,20 +77,13 @@ class MatlabAdapter(object):
       return numpy.array(array, self.np_complex_type)
 
 
-  def produce_design(self, d, n, t, field, design_type):
-    dp = self.engine.DesignParameters(matlab.double([d]), matlab.double([n]), matlab.double([t]), field.value, design_type.value)
-    design, errors, _ = self.engine.produce_design(dp, matlab.double(),nargout=3)
-
-    # Sometimes the MATLAB code produces a singleton array for the errors, which is interpreted
-    # by the Python-MATLAB library as a double rather than as a 1x1 matrix.
-    if isinstance(errors, float):
-      errors = [[errors]]
+  def produce_design(self, d, n, t, field, design_type, seed = None):
+    """Produce a design with produce_design.m, starting from the d x n matrix seed if given.
 
-    # Same as above - if the design is of one vector in 1D, we need to manually make it back into a matrix.
-    if isinstance(design, float) or isinstance(design, complex):
-      design = [[design]]
-
-    return tfpy.base.SphericalDesign(d, n, t, field, design_type, numpy.array(design), errors[0][-1])
+      The number of iterations of the run is left in self.last_iterations.
+    """
+    design, self.last_iterations = produce_design_on_engine(self.engine, d, n, t, field, design_type, seed)
+    return design
 
   def compute_triple_products(self, sd):
     products = self.engine.compute_triple_products(self.numpy_to_matlab_array(sd.matrix))
@@ -77,3 +93,71 @@ class MatlabAdapter(object):
     matrix = self.numpy_to_matlab_array(sd.matrix)
     gramian = self.engine.mtimes(self.engine.ctranspose(matrix), matrix)
     return self.matlab_to_numpy_array(gramian)
+
+  def design_parameters(self, sd):
+    "Return a MATLAB DesignParameters object with the same parameters as sd."
+    return self.engine.DesignParameters(matlab.double([sd.d]), matlab.double([sd.n]), matlab.double([sd.t]), sd.field.value, sd.design_type.value)
+
+  def compute_error(self, sd):
+    return self.engine.computeError(self.design_parameters(sd), self.numpy_to_matlab_array(sd.matrix))
+
+  def compute_gradient(self, sd):
+    gradient = self.engine.computeGradient(self.design_parameters(sd), self.numpy_to_matlab_array(sd.matrix))
+    return self.matlab_to_numpy_array(gradient)
+
+
+class MatlabEnginePool(object):
+  """A fixed set of warm MATLAB engines shared between concurrent design jobs.
+
+    This class is a context manager. On entry it starts all the engines at once (in the
+    background) and adds the matlab/ directory to each of their paths; on exit it quits them.
+    Jobs check out an idle engine for the duration of one call, so up to `engines' calls run
+    at the same time and the start-up cost is paid only once.
+
+  """
+  def __init__(self, engines = 4):
+    """
+      Parameters: engines -- number of MATLAB engines to start
+    """
+    self.engine_count = engines
+    self._idle = None
+    self._engines = []
+    self._executor = None
+
+  def __enter__(self):
+    starting = [matlab.engine.start_matlab(background = True) for _ in range(self.engine_count)]
+    self._engines = [future.result() for future in starting]
+    self._idle = queue.Queue()
+    for engine in self._engines:
+      engine.addpath(str(matlab_dir), nargout = 0)
+      self._idle.put(engine)
+    self._executor = ThreadPoolExecutor(self.engine_count)
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self._executor.shutdown(wait = True, cancel_futures = True)
+    for engine in self._engines:
+      engine.quit()
+    self._engines = []
+    return False # Don't catch exceptions; in particular, we need GeneratorExit to fall through.
+
+  @contextmanager
+  def engine(self):
+    "Check out an idle engine for the duration of a with block, waiting for one if necessary."
+    engine = self._idle.get()
+    try:
+      yield engine
+    finally:
+      self._idle.put(engine)
+
+  def _produce(self, d, n, t, field, design_type, seed):
+    with self.engine() as engine:
+      return produce_design_on_engine(engine, d, n, t, field, design_type, seed)[0]
+
+  def submit(self, d, n, t, field, design_type, seed = None):
+    "Start producing a design on the next free engine and return a concurrent.futures.Future of the SphericalDesign."
+    return self._executor.submit(self._produce, d, n, t, field, design_type, seed)
+
+  def produce_design(self, d, n, t, field, design_type, seed = None):
+    "Produce a design on the next free engine, blocking until it is done (the MatlabAdapter interface)."
+    return self.submit(d, n, t, field, design_type, seed).result()
@@ -0,0 +1,159 @@
+import tfpy.base
+import tfpy.potential
+import tfpy.riemannian
+import numpy
+import time
+
+def normalise(A, design_type):
+  """Project A back onto the constraint set of the design type.
+
+    Equal norm designs have every column normalised (as in iterateOnDesign.m); weighted designs
+    are normalised in the Frobenius norm, matching Manopt's spherefactory.
+  """
+  if design_type == tfpy.base.DesignType.EQUAL_NORM:
+    return A/numpy.linalg.norm(A, axis = -2, keepdims = True)
+  else:
+    return A/numpy.linalg.norm(A, axis = (-2, -1), keepdims = True)
+
+def random_matrix(d, n, field, rng, size = ()):
+  "Return a d x n matrix (or a stack of them) with standard normal entries over the given field."
+  A = rng.standard_normal(size + (d, n))
+  if field == tfpy.base.DesignField.COMPLEX:
+    A = A + 1j*rng.standard_normal(size + (d, n))
+  return A
+
+def random_seed(potential, s, rng):
+  """Return the best of s random normalised matrices, as getRandomComplexSeed.m does.
+
+    Parameters:
+      potential -- a tfpy.potential.DesignPotential.
+      s -- number of random matrices to try.
+      rng -- a numpy.random.Generator.
+  """
+  candidates = normalise(random_matrix(potential.d, potential.n, potential.field, rng, (s,)), potential.design_type)
+  return candidates[numpy.argmin(potential.compute_error(candidates))]
+
+def iterate_on_design(A, k, b, error_multiplier, error_exp, potential, rng, threshold = 0):
+  """Iterate on the d x n matrix A to produce a better design; a port of iterateOnDesign.m.
+
+    Parameters:
+      A -- initial matrix for iteration.
+      k -- number of iterations to run for.
+      b -- walk down the gradient this many times before falling back to random steps.
+      error_multiplier, error_exp -- walk distance is error_multiplier*(error)^error_exp.
+      potential -- a tfpy.potential.DesignPotential.
+      rng -- a numpy.random.Generator.
+      threshold -- stop early once the error is below this value.
+
+    Returns (result, errors, total_badness) as in the MATLAB function; errors only covers the
+    iterations actually run.
+  """
+  error = potential.compute_error(A)
+  grad = potential.compute_gradient(A)
+  errors = []
+  bad_count = 0 # Iterations since we last improved things by walking down the gradient.
+  total_badness = 0
+
+  for h in range(k):
+    errors.append(error)
+    if error < threshold:
+      break
+    mean_walk = error_multiplier*error**error_exp
+
+    # Walk down the gradient while that keeps working, and every b-th failure afterwards (the
+    # random ball shrinks as the error does, so the gradient gets periodic second chances).
+    if bad_count < b or bad_count % b == 0:
+      delta = (mean_walk/6)*rng.standard_normal() + mean_walk
+      A_new = A - delta*numpy.linalg.pinv(grad).T
+    else:
+      A_new = A + random_matrix(potential.d, potential.n, potential.field, rng)*mean_walk
+
+    A_new = normalise(A_new, potential.design_type)
+    error_new = potential.compute_error(A_new)
+
+    if error_new < error:
+      error = error_new
+      A = A_new
+      grad = potential.compute_gradient(A)
+      bad_count = 0
+    else:
+      bad_count = bad_count + 1
+      total_badness = total_badness + 1
+
+  result = A.copy()
+  result[numpy.abs(result) < 1e-6] = 0
+  return result, numpy.array(errors), total_badness
+
+class NumpyAdapter(object):
+  """Produce designs in-process with NumPy, without MATLAB.
+
+    This class is a drop-in replacement for MatlabAdapter wherever only produce_design() is
+    needed (e.g. the generators in tfpy.generate). Two solvers are available:
+      * 'lbfgs' (the default) minimises the potential with Riemannian L-BFGS on the oblique
+        manifold (equal norm designs) or the sphere (weighted designs), like the Manopt
+        trust-regions solver that MatlabAdapter calls; see tfpy.riemannian.
+      * 'walk' runs the gradient walk of iterateOnDesign.m, first choosing the step size as
+        search_designs.m does.
+    Both start from the seed passed to produce_design() or, failing that, from the best of a
+    number of random matrices. The number of iterations and the time in seconds taken by the solver
+    in the last run (not counting the choice of starting point) are kept in last_iterations and last_time.
+
+  """
+  def __init__(self, solver = 'lbfgs', seeds = 1000, iterations = 10000, step_iterations = 100, b = 2, error_exp = 1, threshold = 0, random_state = None):
+    """
+      Parameters: solver -- either 'lbfgs' or 'walk'
+                  seeds -- number of random matrices to choose the starting point from
+                  iterations -- maximum number of iterations of the solver
+                  step_iterations -- number of iterations used to test each step size
+                  b -- number of gradient steps before falling back to random steps
+                  error_exp -- the step size is proportional to (error)^error_exp
+                  threshold -- stop iterating once the error is below this value
+                  random_state -- seed for numpy.random.default_rng (optional)
+    """
+    if solver not in ('lbfgs', 'walk'):
+      raise ValueError(f'Unknown solver: {solver}')
+    self.solver = solver
+    self.seeds = seeds
+    self.iterations = iterations
+    self.step_iterations = step_iterations
+    self.b = b
+    self.error_exp = error_exp
+    self.threshold = threshold
+    self.rng = numpy.random.default_rng(random_state)
+    self.last_iterations = None
+    self.last_time = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    return False # Don't catch exceptions; in particular, we need GeneratorExit to fall through.
+
+  def produce_design(self, d, n, t, field, design_type, seed = None):
+    potential = tfpy.potential.DesignPotential(d, n, t, field, design_type)
+    if seed is None:
+      seed = random_seed(potential, self.seeds, self.rng)
+    else:
+      seed = normalise(numpy.array(seed), design_type)
+
+    if self.solver == 'lbfgs':
+      manifold = tfpy.riemannian.manifold_for(design_type)
+      result = tfpy.riemannian.lbfgs(potential, manifold, seed, self.iterations, self.threshold)
+      self.last_iterations = result.iterations
+      self.last_time = result.time
+      return tfpy.base.SphericalDesign(d, n, t, field, design_type, result.matrix, float(result.errors[-1]))
+
+    start = time.perf_counter()
+    initial_error = potential.compute_error(seed)
+
+    # Find the largest step size that improves on the seed (the r_try loop of search_designs.m).
+    result, errors = seed, numpy.array([initial_error])
+    for r in range(-10, 11):
+      result, errors, _ = iterate_on_design(seed, self.step_iterations, self.b, 10.0**(-r), self.error_exp, potential, self.rng, self.threshold)
+      if errors[-1] < initial_error:
+        result, errors, _ = iterate_on_design(result, self.iterations, self.b, 10.0**(-r), self.error_exp, potential, self.rng, self.threshold)
+        break
+
+    self.last_iterations = len(errors)
+    self.last_time = time.perf_counter() - start
+    return tfpy.base.SphericalDesign(d, n, t, field, design_type, result, float(errors[-1]))
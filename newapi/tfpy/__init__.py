@@ -1,5 +1,18 @@
 from tfpy.base import *
-from tfpy.MatlabAdapter import MatlabAdapter
+try:
+  from tfpy.MatlabAdapter import MatlabAdapter, MatlabEnginePool
+except ImportError:
+  pass # The MATLAB API for Python is not installed; NumpyAdapter still works.
+from tfpy.NumpyAdapter import NumpyAdapter
 from tfpy.generate import design_generator, design_table_generator, design_random_generator
-from tfpy.DatabaseAdapter import DatabaseAdapter
+from tfpy.storage import LazySphericalDesign, open_storage, copy_designs
+try:
+  from tfpy.DatabaseAdapter import DatabaseAdapter
+except ImportError:
+  pass # pymongo is not installed; LocalDatabaseAdapter still works.
+from tfpy.LocalDatabaseAdapter import LocalDatabaseAdapter
+from tfpy.potential import DesignPotential
+from tfpy.cache import CachedAdapter
+from tfpy.MagmaAdapter import MagmaAdapter, MagmaPool, MagmaError
+from tfpy.seeds import SeedLibrary
 from tfpy.matrix_translations import *
@@ -0,0 +1,97 @@
+import tfpy.generate
+import tfpy.bounds
+import asyncio
+import functools
+
+class AsyncAdapter(object):
+  """Wrap an adapter so that produce_design() can be awaited.
+
+    The blocking produce_design() call of the wrapped adapter (MatlabAdapter, MatlabEnginePool,
+    NumpyAdapter, ...) runs in an executor, and at most `concurrency' calls are in flight at
+    once. A single MatlabAdapter owns one engine, so it should be wrapped with concurrency = 1;
+    use a MatlabEnginePool with the same number of engines for more.
+
+  """
+  def __init__(self, adapter, concurrency = 1, executor = None):
+    """
+      Parameters: adapter -- the adapter to wrap
+                  concurrency -- maximum number of simultaneous produce_design() calls
+                  executor -- concurrent.futures executor to run them in (default: the event loop's)
+    """
+    self.adapter = adapter
+    self.concurrency = concurrency
+    self.executor = executor
+    self._semaphore = asyncio.Semaphore(concurrency)
+
+  async def produce_design(self, d, n, t, field, design_type, seed = None):
+    async with self._semaphore:
+      loop = asyncio.get_running_loop()
+      if seed is None:
+        return await loop.run_in_executor(self.executor, self.adapter.produce_design, d, n, t, field, design_type)
+      return await loop.run_in_executor(self.executor, functools.partial(self.adapter.produce_design, d, n, t, field, design_type, seed = seed))
+
+class AsyncDatabaseAdapter(object):
+  """Wrap an open DatabaseAdapter so that its operations can be awaited.
+
+    Each call runs in an executor; pymongo clients are thread-safe, so several may overlap.
+
+  """
+  def __init__(self, database_adapter, executor = None):
+    self.database_adapter = database_adapter
+    self.executor = executor
+
+  async def _run(self, function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+  async def search(self, **kwargs):
+    return await self._run(lambda: list(self.database_adapter.search(**kwargs)))
+
+  async def insert(self, design):
+    return await self._run(self.database_adapter.insert, design)
+
+  async def update(self, dbid, design):
+    return await self._run(self.database_adapter.update, dbid, design)
+
+  async def delete(self, dbid):
+    return await self._run(self.database_adapter.delete, dbid)
+
+async def minimal_design(adapter, d, t, field, design_type, n_min, threshold = 1e-10):
+  "Await designs for n = n_min, n_min + 1, ... and return the first whose error is below threshold."
+  for n in tfpy.generate.to_infinity_and_beyond(n_min):
+    design = await adapter.produce_design(d, n, t, field, design_type)
+    if design.error < threshold:
+      return design
+
+async def design_table_generator(d_min, t_min, field_range, design_type_range, adapter, list_from = 0, threshold = 1e-10, concurrency = 1):
+  """Asynchronous counterpart of tfpy.design_table_generator().
+
+    Up to `concurrency' searches for minimal designs (one per (d, t, field, design_type)) run at
+    once; designs are yielded as soon as they are found, so the consumer can persist them (e.g.
+    with AsyncDatabaseAdapter.insert) while the other searches continue.
+
+    Parameters:
+      d_min, t_min, field_range, design_type_range, list_from, threshold -- as for tfpy.design_table_generator().
+      adapter -- an AsyncAdapter.
+      concurrency -- number of searches to keep in flight.
+  """
+  def searches():
+    for h in tfpy.generate.to_infinity_and_beyond(list_from):
+      d, t = tfpy.generate.cantor_cell(h, d_min, t_min)
+      for field in field_range:
+        n_min = tfpy.bounds.lower_bound(d, t, field)
+        for design_type in design_type_range:
+          yield minimal_design(adapter, d, t, field, design_type, n_min, threshold)
+
+  pending = set()
+  queued = searches()
+  try:
+    while True:
+      while len(pending) < concurrency:
+        pending.add(asyncio.ensure_future(next(queued)))
+      done, pending = await asyncio.wait(pending, return_when = asyncio.FIRST_COMPLETED)
+      for task in done:
+        yield task.result()
+  finally:
+    for task in pending:
+      task.cancel()
@@ -2,7 +2,8 @@ from enum import Enum
 import json
 import numpy
 import tfpy.matrix_translations as matrix_translations
-from copy import deepcopy
+import tfpy.products as products
+import tfpy.classical as classical
 
 class DesignField(Enum):
   """The field of definition of a spherical design."""
@@ -31,6 +32,30 @@ class DimensionError(TFError):
   def __str__(self):
     return f'DimensionError: Incorrect matrix dimension; expected {self.expected_shape}, got {self.actual_shape}.'
 
+# Version of the binary array encoding written by encode_array().
+ARRAY_ENCODING_VERSION = 1
+
+def encode_array(array):
+  """Encode a numpy array as a dictionary holding its raw little-endian bytes with dtype and shape.
+
+    This is how SphericalDesign.to_dict() stores matrices; it is decoded by decode_array().
+  """
+  array = numpy.ascontiguousarray(array)
+  dtype = array.dtype.newbyteorder('<')
+  return {'encoding': 'ndarray', 'version': ARRAY_ENCODING_VERSION, 'dtype': dtype.str, 'shape': list(array.shape),
+          'data': array.astype(dtype, copy = False).tobytes()}
+
+def decode_array(value):
+  """Decode the result of encode_array() without copying the data (the array is read-only).
+
+    Anything else is assumed to be an array in the old nested list format and passed to numpy.array().
+  """
+  if isinstance(value, dict) and value.get('encoding') == 'ndarray':
+    if value['version'] > ARRAY_ENCODING_VERSION:
+      raise TFError(f'Array encoding version {value["version"]} is newer than this version of tfpy supports.')
+    return numpy.frombuffer(value['data'], dtype = numpy.dtype(value['dtype'])).reshape(value['shape'])
+  return numpy.array(value)
+
 def triples(lst):
   n = len(lst)
   for i in range(n):
@@ -48,6 +73,7 @@ class SphericalDesign(object):
       field (base.DesignField): the field the design is over.
       design_type (base.DesignType): the type of design.
       matrix (numpy.array): the actual data of the design.
+      symmetry (dict): the symmetry group found by Magma (see tfpy.MagmaAdapter), or None.
   """
 
   def __init__(self, d, n, t, field, design_type, matrix = None, error = None):
@@ -57,6 +83,7 @@ class SphericalDesign(object):
     self.field = field
     self.design_type = design_type
     self.error = error
+    self.symmetry = None
     self._gramian = None
     self._triple_products = None
 
@@ -73,27 +100,50 @@ class SphericalDesign(object):
 
   @property
   def triple_products(self):
-    "Compute the sorted list of 3-products of the design."
+    """Compute the sorted list of 3-products of the design.
+
+      The products <u_i,u_j><u_j,u_k><u_k,u_i> are built from the Gram matrix in blocks, see
+      tfpy.products.compute_triple_products().
+    """
     if self._triple_products is None:
-      self._triple_products = []
-      for u,v,w in triples(self.matrix):
-        self._triple_products.append(numpy.dot(u,v)*numpy.dot(v,w)*numpy.dot(w,u))
-      self._triple_products = numpy.sort(numpy.array(self._triple_products)[::-1])
+      self._triple_products = products.compute_triple_products(self.gramian)
 
     return self._triple_products
 
+  def triple_product_statistics(self, accuracy = 6, bins = 100, top_k = 10, max_bytes = products.DEFAULT_MAX_BYTES):
+    """Summarise the 3-products of the design without materialising all n^3 of them.
+
+      The result (a tfpy.products.TripleProductStatistics) holds a histogram of the absolute
+      values, the distinct products rounded to accuracy decimal places with their
+      multiplicities, and the smallest, largest and top_k largest absolute values. See
+      tfpy.products.triple_product_statistics() for the parameters.
+    """
+    return products.triple_product_statistics(self.gramian, accuracy, bins, top_k, max_bytes)
+
+  def classical_design(self, tolerance = 6):
+    """Decide whether the blocks of equal Gram entries of the design form a classical t-(v,k,λ) design.
+
+      Returns a tfpy.classical.ClassicalDesign, or None; see tfpy.classical.classical_design().
+    """
+    return classical.classical_design(self.gramian, tolerance)
+
   @classmethod
   def from_dict(cls, dct):
-    "Construct a SphericalDesign from a return value of to_dict()."
-    if 'matrix' in dct:
+    """Construct a SphericalDesign from a return value of to_dict().
+
+      Dictionaries in the old format, with matrices as nested lists of numbers or of
+      (real, imag) pairs, are also accepted. Either way the arrays of the design are writable
+      copies, independent of dct.
+    """
+    if 'matrix' in dct and isinstance(dct['matrix'], dict):
+      matrix = decode_array(dct['matrix']).copy()
+    elif 'matrix' in dct:
+      cells = numpy.array(dct['matrix'], dtype = float)
       if dct['field'] == 'complex':
-        matrix = numpy.array([[complex(cell[0],cell[1]) for cell in row] for row in dct['matrix']])
+        matrix = cells[..., 0] + 1j*cells[..., 1]
       elif dct['field'] == 'real':
         # Some code somewhere is sometimes putting real values into the form [real, imag] where imag = 0. Catch this here.
-        if isinstance(dct['matrix'][0][0], list):
-          matrix = numpy.array([[float(cell[0]) for cell in row] for row in dct['matrix']])
-        else:
-          matrix = numpy.array(dct['matrix'])
+        matrix = cells[..., 0] if cells.ndim == 3 else cells
       else:
         assert False # should not get here
     else:
@@ -103,31 +153,31 @@ class SphericalDesign(object):
 
     if 'error' in dct:
       new_design.error = dct['error']
-    if 'triple_products' in dct:
-      new_design._triple_products = dct['triple_products']
-    if 'gramian' in dct:
-      new_design._gramian = dct['gramian']
+    if dct.get('symmetry') is not None:
+      new_design.symmetry = dct['symmetry']
+    if dct.get('triple_products') is not None:
+      new_design._triple_products = decode_array(dct['triple_products']).copy()
+    if dct.get('gramian') is not None:
+      new_design._gramian = decode_array(dct['gramian']).copy()
     return new_design
 
-  def to_dict(self):
-    "Return a serialisable dictionary that can be used to recreate this design using from_dict()."
-    dct = deepcopy(vars(self))
-
-    if '_gramian' in dct:
-      dct['gramian'] = dct.pop('_gramian')
-
-    if '_triple_products' in dct:
-      dct['triple_products'] = dct.pop('_triple_products')
-
-    dct['field'] = dct['field'].value
-    dct['design_type'] = dct['design_type'].value
-    if self.field == DesignField.COMPLEX:
-      dct['matrix'] = [[(cell.real, cell.imag) for cell in row] for row in dct['matrix'].tolist()]
-    elif self.field == DesignField.REAL:
-      dct['matrix'] = dct['matrix'].tolist()
-    else:
-      assert False # Should never get here.
+  def to_dict(self, cached = False):
+    """Return a serialisable dictionary that can be used to recreate this design using from_dict().
 
+      The matrix is stored in binary form by encode_array(). The Gramian and 3-products can be
+      recomputed from it, so they are only included (in the same form) if cached is set and they
+      have already been computed.
+    """
+    dct = {'d': self.d, 'n': self.n, 't': self.t, 'field': self.field.value, 'design_type': self.design_type.value, 'error': self.error}
+
+    if self.matrix is not None:
+      dct['matrix'] = encode_array(self.matrix)
+    if self.symmetry is not None:
+      dct['symmetry'] = self.symmetry
+    if cached and self._gramian is not None:
+      dct['gramian'] = encode_array(self._gramian)
+    if cached and self._triple_products is not None:
+      dct['triple_products'] = encode_array(self._triple_products)
 
     return dct
 
@@ -0,0 +1,110 @@
+import tfpy.base
+from scipy.optimize import linprog
+from scipy.special import comb as nchoosek, eval_jacobi
+import functools
+import json
+import math
+import numpy
+import pathlib
+
+DEFAULT_CACHE_FILE = pathlib.Path.home() / '.cache' / 'tfpy' / 'lp_bounds.json'
+
+# Part of every key of the on-disk cache; bump it whenever lp_bound_value() changes (its LP, solver
+# or parameters), so that bounds computed by the old version are not served any more.
+LP_CACHE_VERSION = 1
+LP_SOLVER = 'highs'
+
+def lower_bound_n(d,t):
+  if t % 2 == 0:
+    e = t/2
+    return nchoosek(d + e - 1, d - 1) + nchoosek(d + e - 2, d - 1)
+  else:
+    e = (t-1)/2
+    return 2*nchoosek(d + e - 1, d - 1)
+
+def jacobi_parameters(d, field):
+  """Return the Jacobi parameters (alpha, beta) of the zonal polynomials of real or complex projective space.
+
+    A set of lines is a spherical (t,t)-design exactly when it is a projective t-design, i.e. when
+    the zonal polynomials Q_1, ..., Q_t of |<u,v>|^2 sum to zero over all pairs of lines.
+  """
+  if field == tfpy.base.DesignField.REAL:
+    return (d - 3)/2, -1/2
+  elif field == tfpy.base.DesignField.COMPLEX:
+    return d - 2, 0
+  else:
+    assert False # Should never get here.
+
+def zonal_polynomials(d, field, degree, x):
+  "Return the matrix Q[i,k] = Q_k(x_i) for k = 0, ..., degree, normalised so that Q_k(1) = 1."
+  alpha, beta = jacobi_parameters(d, field)
+  return numpy.array([eval_jacobi(k, alpha, beta, 2*x - 1)/eval_jacobi(k, alpha, beta, 1) for k in range(degree + 1)]).T
+
+def lp_bound_value(d, t, field, degree = None, grid = 2001, check_grid = 100001):
+  """Solve the Delsarte linear programme for (t,t)-designs and return the (real-valued) lower bound on n.
+
+    If f = sum f_k Q_k with f_0 = 1, f_k <= 0 for k > t, and f >= 0 on [0,1], then every
+    (t,t)-design, weighted or not, has n >= f(1). The LP maximises f(1) subject to f >= 0 on a
+    grid; any negativity of the optimum on the finer check grid is then added back to f, so
+    the value returned is a valid bound and not an artefact of the discretisation.
+
+    Parameters:
+      d, t -- design parameters.
+      field -- a tfpy.DesignField.
+      degree -- degree of f (default: 2t + 2).
+      grid, check_grid -- number of points of [0,1] used in the LP and in the check.
+  """
+  if d == 1:
+    return 1.0
+
+  degree = degree or 2*t + 2
+  Q = zonal_polynomials(d, field, degree, numpy.linspace(0, 1, grid))
+
+  # Variables f_1, ..., f_degree; f_0 = 1 and f(1) = sum f_k, since Q_k(1) = 1.
+  result = linprog(-numpy.ones(degree), A_ub = -Q[:, 1:], b_ub = Q[:, 0],
+                   bounds = [(None, None)]*t + [(None, 0)]*(degree - t), method = LP_SOLVER)
+  if result.status != 0:
+    return 1.0
+
+  f = numpy.concatenate(([1.0], result.x))
+  shift = max(0.0, -numpy.min(zonal_polynomials(d, field, degree, numpy.linspace(0, 1, check_grid)) @ f))
+  return (numpy.sum(f) + shift)/(1 + shift)
+
+def _cache_prefix():
+  return f'v{LP_CACHE_VERSION}/{LP_SOLVER}/'
+
+def _cache_key(d, t, field):
+  return f'{_cache_prefix()}{d},{t},{field.value}'
+
+@functools.lru_cache(maxsize = None)
+def lp_bound(d, t, field, cache_file = DEFAULT_CACHE_FILE):
+  """Return the Delsarte LP lower bound on n for (d,n,t)-designs over field, as an integer.
+
+    Results are memoised in memory and in the JSON file cache_file (None to disable). The keys
+    of the file include LP_CACHE_VERSION and LP_SOLVER; entries of other versions are dropped
+    when the file is next written.
+  """
+  cache = {}
+  if cache_file is not None:
+    cache_file = pathlib.Path(cache_file)
+    try:
+      with cache_file.open() as f:
+        cache = json.load(f)
+    except (OSError, ValueError):
+      cache = {}
+
+  key = _cache_key(d, t, field)
+  if key not in cache:
+    cache = {k: v for k, v in cache.items() if k.startswith(_cache_prefix())}
+    cache[key] = math.ceil(lp_bound_value(d, t, field) - 1e-6)
+    if cache_file is not None:
+      cache_file.parent.mkdir(parents = True, exist_ok = True)
+      temporary = cache_file.with_suffix('.tmp')
+      with temporary.open('w') as f:
+        json.dump(cache, f, indent = 1, sort_keys = True)
+      temporary.replace(cache_file)
+  return int(cache[key])
+
+def lower_bound(d, t, field):
+  "Return the best available lower bound on n for (d,n,t)-designs over field: the LP bound or lower_bound_n(d,t)."
+  return max(int(lower_bound_n(d, t)), lp_bound(d, t, field))
@@ -0,0 +1,97 @@
+import tfpy.base
+import time
+
+class CachedAdapter(object):
+  """Wrap an adapter so that produce_design() first looks in a DatabaseAdapter.
+
+    If the store already holds a design with the requested parameters and error below threshold,
+    the best such design is returned without calling the wrapped adapter. If earlier attempts at
+    the parameters failed (at least min_failures times, the latest no more than max_age seconds
+    ago), a design with no matrix and the best recorded error is returned, so that the generators
+    skip that n as infeasible. Otherwise the wrapped adapter is called and its result is stored
+    (if it meets the threshold) or recorded as a failure (if not).
+
+    This class is a context manager that enters and exits both the adapter and the database, so
+    that it can also be built by an adapter_factory in worker processes, e.g.
+    functools.partial(CachedAdapter, tfpy.NumpyAdapter(), tfpy.DatabaseAdapter()).
+
+  """
+  # Defaults for how often and how recently parameters must have failed before they are skipped. The
+  # optimisers are stochastic, so a single failure is not taken as proof that no design exists.
+  DEFAULT_MIN_FAILURES = 2
+  DEFAULT_MAX_AGE = 7*24*3600
+
+  def __init__(self, adapter, database, threshold = 1e-10, max_age = DEFAULT_MAX_AGE, min_failures = DEFAULT_MIN_FAILURES, store = True):
+    """
+      Parameters: adapter -- the adapter to wrap (MatlabAdapter, NumpyAdapter, ...)
+                  database -- a DatabaseAdapter
+                  threshold -- largest error of a stored design that counts as a hit
+                  max_age -- seconds after which recorded failures are ignored (default: a week; None for never)
+                  min_failures -- number of recorded failures before parameters are skipped (default: 2)
+                  store -- insert newly produced designs that meet the threshold into the database
+    """
+    self.adapter = adapter
+    self.database = database
+    self.threshold = threshold
+    self.max_age = max_age
+    self.min_failures = min_failures
+    self.store = store
+    self.hits = 0
+    self.skips = 0
+    self.misses = 0
+    self.last_iterations = None
+
+  def __enter__(self):
+    self.adapter.__enter__()
+    self.database.__enter__()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.database.__exit__(exc_type, exc_value, traceback)
+    return self.adapter.__exit__(exc_type, exc_value, traceback)
+
+  def lookup(self, d, n, t, field, design_type):
+    "Return the best stored design meeting the threshold, a matrixless design for known failures, or None."
+    # Only the metadata is read for the search; the matrix of the best design is then fetched on its own.
+    stored = [design for design in self.database.search(lazy = True, d = [d], n = [n], t = [t], field = [field], design_type = [design_type])
+              if design.error is not None and design.error < self.threshold]
+    for best in sorted(stored, key = lambda design: design.error):
+      try:
+        matrix = best.matrix
+      except LookupError:
+        matrix = None
+      if matrix is None:
+        continue # Deleted since the search.
+      # A plain design, so that it can be sent back from a worker process without the store.
+      design = tfpy.base.SphericalDesign(d, n, t, field, design_type, matrix, best.error)
+      design.dbid = best.dbid
+      return design
+
+    failure = self.database.find_failure(d, n, t, field, design_type)
+    if failure is not None and failure['attempts'] >= self.min_failures and failure['error'] >= self.threshold:
+      if self.max_age is None or time.time() - failure['time'] <= self.max_age:
+        return tfpy.base.SphericalDesign(d, n, t, field, design_type, error = failure['error'])
+    return None
+
+  def produce_design(self, d, n, t, field, design_type, seed = None):
+    design = self.lookup(d, n, t, field, design_type)
+    if design is not None:
+      self.last_iterations = 0
+      if design.matrix is None:
+        self.skips = self.skips + 1
+      else:
+        self.hits = self.hits + 1
+      return design
+
+    self.misses = self.misses + 1
+    if seed is None:
+      design = self.adapter.produce_design(d, n, t, field, design_type)
+    else:
+      design = self.adapter.produce_design(d, n, t, field, design_type, seed = seed)
+    self.last_iterations = getattr(self.adapter, 'last_iterations', None)
+    if design.error < self.threshold:
+      if self.store:
+        design.dbid = self.database.insert(design)
+    else:
+      self.database.record_failure(design)
+    return design
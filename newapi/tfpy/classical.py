@@ -0,0 +1,108 @@
+from collections import namedtuple
+from itertools import combinations, islice
+from math import comb
+import logging
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# Default cap on the size of the boolean array of a single batch of t-subsets, in bytes.
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+ClassicalDesign = namedtuple('ClassicalDesign', ['t', 'v', 'k', 'l'])
+ClassicalDesign.__doc__ = "Parameters of a classical t-(v,k,λ) design; l is λ."
+
+def incidence_matrix(gramian, tolerance):
+  """Return the blocks of a Gram matrix as a boolean incidence matrix, and the rounded Gram entry of each block.
+
+    There is one block for each distinct off-diagonal entry of the Gram matrix (rounded to
+    tolerance decimal places); it contains every vector i such that that entry is G_ij or G_ji
+    for some j. Row b of the incidence matrix is block b, and column i is vector i.
+
+    Parameters:
+      gramian -- the n x n Gram matrix of the design.
+      tolerance -- the number of decimal places to compare.
+  """
+  gramian = numpy.asarray(gramian)
+  if gramian.ndim != 2 or gramian.shape[0] != gramian.shape[1]:
+    raise ValueError(f'Expected a square matrix, got shape {gramian.shape}.')
+  n = gramian.shape[0]
+
+  i, j = numpy.nonzero(~numpy.eye(n, dtype = bool))
+  values, inverse = numpy.unique(numpy.round(gramian[i, j], tolerance), return_inverse = True)
+  incidence = numpy.zeros((len(values), n), dtype = bool)
+  incidence[inverse, i] = True
+  incidence[inverse, j] = True
+  return incidence, values
+
+def subset_counts(incidence, t, max_bytes = DEFAULT_MAX_BYTES):
+  """Yield, in batches, the number of blocks containing each t-subset of the varieties (columns).
+
+    The counts of 1- and 2-subsets are the column sums and the off-diagonal entries of the
+    product of the incidence matrix with its transpose; larger subsets are taken from
+    itertools.combinations() a batch at a time, so that at most about max_bytes are in use.
+  """
+  incidence = numpy.asarray(incidence, dtype = bool)
+  b, v = incidence.shape
+  if t == 1:
+    yield incidence.sum(axis = 0)
+  elif t == 2:
+    products = incidence.T.astype(numpy.int64) @ incidence.astype(numpy.int64)
+    yield products[numpy.triu_indices(v, 1)]
+  else:
+    batch = max(1, max_bytes // max(1, b * t))
+    subsets = combinations(range(v), t)
+    while True:
+      chunk = numpy.array(list(islice(subsets, batch)), dtype = numpy.intp).reshape(-1, t)
+      if len(chunk) == 0:
+        return
+      yield incidence[:, chunk].all(axis = 2).sum(axis = 0) # b x batch x t -> batch
+
+def classical_design(gramian, tolerance, max_bytes = DEFAULT_MAX_BYTES):
+  """Decide whether the design with Gram matrix gramian is a classical t-(v,k,λ) design.
+
+    The blocks are found by incidence_matrix(): entries are compared after rounding to
+    tolerance decimal places. If the blocks all have the same size k, the design is a classical
+    t-design if every t-subset of the v varieties lies in the same number λ of blocks. Progress
+    is logged (at level DEBUG) to the logger of this module.
+
+    Parameters:
+      gramian -- the n x n Gram matrix of the design.
+      tolerance -- the number of decimal places to compare.
+      max_bytes -- upper bound on the memory used by a single batch of t-subsets.
+
+    Returns the ClassicalDesign with the largest such t, or None if there is none.
+  """
+  incidence, values = incidence_matrix(gramian, tolerance)
+  incidence = incidence[:, incidence.any(axis = 0)] # Only vectors in some block are varieties.
+  b, v = incidence.shape
+  logger.debug('Blocks: %s', {value: numpy.flatnonzero(row).tolist() for value, row in zip(values.tolist(), incidence)})
+  logger.debug('Block count: %d', b)
+
+  sizes = numpy.unique(incidence.sum(axis = 1))
+  if len(sizes) != 1:
+    logger.debug('The block size is not constant: %s.', sizes.tolist())
+    return None
+  k = int(sizes[0])
+  logger.debug('Block size: %d, varieties: %d', k, v)
+
+  if k == v:
+    # Every block holds every variety, so each subset lies in all b blocks.
+    logger.debug('Every block contains all varieties; trivially a %d-(%d,%d,%d) design.', k, v, k, b)
+    return ClassicalDesign(k, v, k, b)
+
+  # A t-design is also an s-design for every s < t, so stop at the first t that fails.
+  found = None
+  for t in range(1, k + 1):
+    logger.debug('Checking t = %d, λ = %s...', t, b * comb(k, t) / comb(v, t))
+    counts = None
+    for batch in subset_counts(incidence, t, max_bytes):
+      counts = numpy.union1d(counts, batch) if counts is not None else numpy.unique(batch)
+      if len(counts) > 1:
+        break
+    if counts is None or len(counts) != 1:
+      logger.debug('Not a %d-design; counts for different subsets include %s.', t, None if counts is None else counts.tolist())
+      break
+    found = ClassicalDesign(t, v, k, int(counts[0]))
+    logger.debug('The matrix forms a %d-(%d,%d,%d) design.', *found)
+  return found
@@ -1,19 +1,43 @@
 import tfpy.base
-import tfpy.MatlabAdapter
-from scipy.special import comb as nchoosek
+import tfpy.parallel
+import tfpy.bounds
+from tfpy.bounds import lower_bound_n # Re-exported; it used to live here.
+import tfpy.journal
 import numpy
 import random
+import itertools
+import collections
+import contextlib
 
-def design_generator(d_range, n_range, t_range, field_range, design_type_range, matlab_adapter = None):
+def default_adapter():
+  "Return the adapter used when none is passed to a generator: a connection to a running MATLAB session."
+  # Imported here so that the generators can be used with a NumpyAdapter when MATLAB is not installed.
+  from tfpy.MatlabAdapter import MatlabAdapter
+  return MatlabAdapter(existing = True)
+
+def design_generator(d_range, n_range, t_range, field_range, design_type_range, matlab_adapter = None, workers = None, adapter_factory = tfpy.parallel.matlab_adapter_factory, ordered = True, timeout = None):
   """Generate best approximations to spherical designs for given sets of parameters.
 
     Parameters:
       d_range, n_range, t_range -- lists of numerical parameters for the t-design.
       field_range -- a list of tfpy.DesignField values giving the field(s) to search in.
       design_type_range -- a list of tfpy.DesignType values specifying the type of design to find.
-      matlab_adapter -- use an existing MatlabAdapter object (optional)
+      matlab_adapter -- use an existing MatlabAdapter object, or any object with the same produce_design()
+                        method such as a NumpyAdapter (optional)
+      workers -- if given, produce the designs in this many worker processes, each with its own
+                 adapter made by adapter_factory; matlab_adapter is then ignored (optional)
+      adapter_factory -- picklable callable returning an adapter, e.g. tfpy.NumpyAdapter (default:
+                         start a new MATLAB engine in each worker)
+      ordered -- in parallel mode, yield designs in parameter order (True) or as they finish (False)
+      timeout -- in parallel mode, skip any single design that takes longer than this many seconds
   """
 
+  if workers is not None:
+    def parallel():
+      with tfpy.parallel.WorkerPool(workers, adapter_factory, timeout) as pool:
+        yield from pool.produce(itertools.product(d_range, n_range, t_range, field_range, design_type_range), ordered)
+    return parallel()
+
   # Peform the actual loop in a dummy function, so that we can wrap it in a context manager if
   # needed without duplicate code.
   def dummy(ma):
@@ -25,21 +49,12 @@ def design_generator(d_range, n_range, t_range, field_range, design_type_range,
               yield ma.produce_design(d,n,t,field,design_type)
 
   if matlab_adapter is None:
-    with tfpy.MatlabAdapter(existing = True) as ma:
+    with default_adapter() as ma:
       return dummy(ma)
   else:
       return dummy(matlab_adapter)
 
 
-def lower_bound_n(d,t):
-  if t % 2 == 0:
-    e = t/2
-    return nchoosek(d + e - 1, d - 1) + nchoosek(d + e - 2, d - 1)
-  else:
-    e = (t-1)/2
-    return 2*nchoosek(d + e - 1, d - 1)
-
-
 def to_infinity_and_beyond(counter):
   index = counter - 1
   while True:
@@ -47,56 +62,188 @@ def to_infinity_and_beyond(counter):
     yield index
 
 
-def design_table_generator(d_min, t_min, field_range, design_type_range, list_from = 0, threshold = 1e-10, matlab_adapter = None):
-  def dummy(ma):
-    for h in to_infinity_and_beyond(list_from):
-        # Apply inverse Cantor pairing to h (https://en.wikipedia.org/wiki/Pairing_function#Inverting_the_Cantor_pairing_function)
-        w = numpy.floor((numpy.sqrt(8*h+1)-1)/2)
-        v = (w**2 + w)/2
-        d = h - v
-        t = w - d
+def cantor_cell(h, d_min, t_min):
+  "Return the (d, t) cell of the design table with Cantor-paired index h."
+  # Apply inverse Cantor pairing to h (https://en.wikipedia.org/wiki/Pairing_function#Inverting_the_Cantor_pairing_function)
+  w = numpy.floor((numpy.sqrt(8*h+1)-1)/2)
+  v = (w**2 + w)/2
+  d = h - v
+  t = w - d
+  return int(d + d_min), int(t + t_min)
 
-        d = int(d + d_min)
-        t = int(t + t_min)
-        n_min = int(lower_bound_n(d, t))
+def seeded_produce(submit, seed_library, d, n, t, field, design_type):
+  """Call submit(d, n, t, field, design_type), passing seed = the best seed in seed_library if there is one.
+
+    Returns (result of submit, whether a seed was passed).
+  """
+  seed = None if seed_library is None else seed_library.seed(d, n, t, field, design_type)
+  if seed is None:
+    return submit(d,n,t,field,design_type), False
+  return submit(d,n,t,field,design_type, seed = seed[1]), True
 
+def minimal_design(ma, d, t, field, design_type, n_min, threshold, on_attempt = None, seed_library = None):
+  """Produce designs for n = n_min, n_min + 1, ... one at a time and return the first with error below threshold.
+
+    If given, on_attempt(n) is called before each n is tried. If a tfpy.seeds.SeedLibrary is given,
+    each search starts from its best seed, and every design produced is added to it; a seeded
+    search is repeated unseeded if the library asks for it (see SeedLibrary.fallback and baseline).
+  """
+  for n in to_infinity_and_beyond(n_min):
+    if on_attempt is not None:
+      on_attempt(n)
+    design, seeded = seeded_produce(ma.produce_design, seed_library, d, n, t, field, design_type)
+    if seed_library is not None:
+      seed_library.record(design, getattr(ma, 'last_iterations', None), seeded)
+      seed_library.add(design)
+      if seed_library.rerun_unseeded(design, seeded, threshold):
+        unseeded = ma.produce_design(d,n,t,field,design_type)
+        seed_library.record(unseeded, getattr(ma, 'last_iterations', None), False)
+        seed_library.add(unseeded)
+        design = min(design, unseeded, key = lambda design: design.error)
+    if design.error < threshold:
+      return design
+
+def speculative_minimal_design(pool, d, t, field, design_type, n_min, threshold, window, on_attempt = None, seed_library = None):
+  """Return the same design as minimal_design(), producing window consecutive values of n at once.
+
+    The jobs for n, n+1, ..., n+window-1 run in the worker pool together; whenever the smallest
+    outstanding n fails, the next n is queued behind the others. As soon as the smallest
+    outstanding n succeeds, the jobs for larger n are cancelled (those already running are left
+    to finish in the background) and its design is returned.
+
+    Parameters:
+      pool -- an open tfpy.parallel.WorkerPool.
+      window -- number of values of n to keep in flight.
+      on_attempt -- if given, on_attempt(n) is called with the smallest outstanding n whenever it changes.
+      seed_library -- as for minimal_design(); seeds are taken when a job is queued, and the
+                      iterations of every run (reported by the workers) are recorded (optional)
+  """
+  ns = to_infinity_and_beyond(n_min)
+  jobs = collections.deque()
+  smallest = n_min
+  try:
+    while True:
+      while len(jobs) < window:
+        n = next(ns)
+        jobs.append(seeded_produce(pool.submit, seed_library, d, n, t, field, design_type))
+      if on_attempt is not None:
+        on_attempt(smallest)
+      smallest = smallest + 1
+      try:
+        job, seeded = jobs.popleft()
+        design = job.result()
+        if seed_library is not None:
+          seed_library.record(design, design.iterations, seeded)
+          seed_library.add(design)
+          if seed_library.rerun_unseeded(design, seeded, threshold):
+            unseeded = pool.submit(d,design.n,t,field,design_type).result()
+            seed_library.record(unseeded, unseeded.iterations, False)
+            seed_library.add(unseeded)
+            design = min(design, unseeded, key = lambda design: design.error)
+      except tfpy.parallel.JobTimeout:
+        continue
+      if design.error < threshold:
+        return design
+  finally:
+    for job, _ in jobs:
+      job.cancel()
+
+def minimal_design_search(ma, threshold, workers, adapter_factory, window, timeout, seed_library = None):
+  """Return a context manager yielding a function search(d, t, field, design_type, n_min) that finds minimal designs.
+
+    With workers = None the search runs sequentially on the adapter ma; otherwise a worker pool is
+    started and each search keeps window (default: workers) values of n in flight. Searches are
+    seeded from, and add their designs to, seed_library if it is given.
+  """
+  @contextlib.contextmanager
+  def sequential():
+    if ma is None:
+      with default_adapter() as adapter:
+        yield lambda d, t, field, design_type, n_min, on_attempt = None: minimal_design(adapter, d, t, field, design_type, n_min, threshold, on_attempt, seed_library)
+    else:
+      yield lambda d, t, field, design_type, n_min, on_attempt = None: minimal_design(ma, d, t, field, design_type, n_min, threshold, on_attempt, seed_library)
+
+  @contextlib.contextmanager
+  def speculative():
+    with tfpy.parallel.WorkerPool(workers, adapter_factory, timeout) as pool:
+      yield lambda d, t, field, design_type, n_min, on_attempt = None: speculative_minimal_design(pool, d, t, field, design_type, n_min, threshold, window or workers, on_attempt, seed_library)
+
+  return sequential() if workers is None else speculative()
+
+def design_table_generator(d_min, t_min, field_range, design_type_range, list_from = 0, threshold = 1e-10, matlab_adapter = None,
+                           workers = None, adapter_factory = tfpy.parallel.matlab_adapter_factory, window = None, timeout = None, journal = None,
+                           seed_library = None):
+  """Generate minimal designs for every (d, t) with d >= d_min and t >= t_min, in Cantor-paired order.
+
+    For each cell and each field and design type, n is increased from the lower bound of
+    tfpy.bounds.lower_bound(d, t, field) (the Delsarte LP bound, memoised on disk) until
+    a design with error below threshold is found.
+
+    Parameters:
+      d_min, t_min -- smallest parameters in the table.
+      field_range, design_type_range -- as for design_generator().
+      list_from -- Cantor-paired index of the first cell.
+      threshold -- largest error of a design that is accepted.
+      matlab_adapter -- as for design_generator().
+      workers -- if given, search window values of n at once in this many worker processes
+                 (see speculative_minimal_design()); matlab_adapter is then ignored (optional)
+      adapter_factory, timeout -- as for design_generator().
+      window -- number of values of n in flight per search (default: workers)
+      journal -- path of a progress journal (see tfpy.journal.SweepJournal). If given, the sweep
+                 resumes from the cell and values of n recorded there (list_from is then only used
+                 for a new journal), and records its progress as it goes (optional)
+      seed_library -- a tfpy.seeds.SeedLibrary to start searches from neighbouring designs, e.g.
+                      SeedLibrary(database.search()); designs found are added to it (optional)
+  """
+  def dummy(search):
+    for h in to_infinity_and_beyond(list_from):
+        d, t = cantor_cell(h, d_min, t_min)
         for field in field_range:
+          n_min = tfpy.bounds.lower_bound(d, t, field)
           for design_type in design_type_range:
-            break_loop_on_reentry = False
-            for n in to_infinity_and_beyond(n_min):
-              if break_loop_on_reentry:
-                break
-              design = ma.produce_design(d,n,t,field,design_type)
-              if design.error < threshold:
-                break_loop_on_reentry = True
-                yield design
-
-  if matlab_adapter is None:
-    with tfpy.MatlabAdapter(existing = True) as ma:
-      return dummy(ma)
-  else:
-      return dummy(matlab_adapter)
+            yield search(d, t, field, design_type, n_min)
 
-def design_random_generator(d_max, t_max, field_range, design_type_range, threshold = 1e-10, matlab_adapter = None):
-  def dummy(ma):
+  def journalled(search, sj):
+    for h in to_infinity_and_beyond(sj.start(list_from, d_min, t_min)):
+        d, t = cantor_cell(h, d_min, t_min)
+        for field in field_range:
+          n_min = tfpy.bounds.lower_bound(d, t, field)
+          for design_type in design_type_range:
+            if sj.is_finished(field, design_type):
+              continue
+            yield search(d, t, field, design_type, sj.resume_n(field, design_type, n_min),
+                         lambda n: sj.attempt(field, design_type, n))
+            # Only mark the search finished once the consumer asks for the next design, so that a
+            # design is never lost between being yielded and being stored.
+            sj.finish(field, design_type)
+        sj.next_cell(h + 1)
+
+  def run():
+    with minimal_design_search(matlab_adapter, threshold, workers, adapter_factory, window, timeout, seed_library) as search:
+      if journal is None:
+        yield from dummy(search)
+      else:
+        with tfpy.journal.SweepJournal(journal) as sj:
+          yield from journalled(search, sj)
+  return run()
+
+def design_random_generator(d_max, t_max, field_range, design_type_range, threshold = 1e-10, matlab_adapter = None,
+                            workers = None, adapter_factory = tfpy.parallel.matlab_adapter_factory, window = None, timeout = None,
+                            seed_library = None):
+  """Generate minimal designs for random d <= d_max and t <= t_max.
+
+    The parameters are as for design_table_generator().
+  """
+  def dummy(search):
     for h in to_infinity_and_beyond(0):
         d = random.randrange(1,d_max+1)
         t = random.randrange(1,t_max+1)
-        n_min = int(lower_bound_n(d, t))
-
         for field in field_range:
+          n_min = tfpy.bounds.lower_bound(d, t, field)
           for design_type in design_type_range:
-            break_loop_on_reentry = False
-            for n in to_infinity_and_beyond(n_min):
-              if break_loop_on_reentry:
-                break
-              design = ma.produce_design(d,n,t,field,design_type)
-              if design.error < threshold:
-                break_loop_on_reentry = True
-                yield design
+            yield search(d, t, field, design_type, n_min)
 
-  if matlab_adapter is None:
-    with tfpy.MatlabAdapter(existing = True) as ma:
-      return dummy(ma)
-  else:
-      return dummy(matlab_adapter)
+  def run():
+    with minimal_design_search(matlab_adapter, threshold, workers, adapter_factory, window, timeout, seed_library) as search:
+      yield from dummy(search)
+  return run()
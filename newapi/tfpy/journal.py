@@ -0,0 +1,97 @@
+import json
+import os
+import pathlib
+import signal
+import threading
+import time
+
+class SweepJournal(object):
+  """A progress journal for design_table_generator(), kept in a local JSON file.
+
+    The journal records the Cantor-paired index of the current (d, t) cell, the n currently being
+    tried for each field and design type in that cell, which of them are finished, and the total
+    elapsed time. It is rewritten atomically every time the search moves on, so a sweep that is
+    killed resumes from the last n it was working on.
+
+    This class is a context manager; while it is open, SIGTERM is turned into SystemExit so that
+    the generator is unwound and the journal saved, as on KeyboardInterrupt.
+
+  """
+  def __init__(self, path):
+    """
+      Parameters: path -- the journal file; it is created if it does not exist
+    """
+    self.path = pathlib.Path(path)
+    self.state = None
+    self._started = None
+    self._previous_handler = None
+
+  def __enter__(self):
+    try:
+      with self.path.open() as f:
+        self.state = json.load(f)
+    except FileNotFoundError:
+      self.state = None
+    self._started = time.monotonic()
+
+    if threading.current_thread() is threading.main_thread():
+      self._previous_handler = signal.signal(signal.SIGTERM, self._on_sigterm)
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if self.state is not None:
+      self.save()
+    if self._previous_handler is not None:
+      signal.signal(signal.SIGTERM, self._previous_handler)
+      self._previous_handler = None
+    return False
+
+  @staticmethod
+  def _on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+  @staticmethod
+  def _key(field, design_type):
+    return f'{field.value}/{design_type.value}'
+
+  def start(self, list_from, d_min, t_min):
+    "Return the Cantor index to start from, resetting the journal if it belongs to a different table."
+    if self.state is None or self.state.get('d_min') != d_min or self.state.get('t_min') != t_min:
+      self.state = {'d_min': d_min, 't_min': t_min, 'h': list_from, 'n': {}, 'finished': [], 'elapsed': 0.0}
+      self.save()
+    return self.state['h']
+
+  def resume_n(self, field, design_type, n_min):
+    "Return the n to resume the search for (field, design_type) in the current cell from."
+    return max(n_min, self.state['n'].get(self._key(field, design_type), n_min))
+
+  def is_finished(self, field, design_type):
+    return self._key(field, design_type) in self.state['finished']
+
+  def attempt(self, field, design_type, n):
+    "Record that n is about to be tried for (field, design_type)."
+    self.state['n'][self._key(field, design_type)] = n
+    self.save()
+
+  def finish(self, field, design_type):
+    "Record that the minimal design for (field, design_type) in the current cell has been handed over."
+    self.state['finished'].append(self._key(field, design_type))
+    self.save()
+
+  def next_cell(self, h):
+    "Record that the sweep has moved on to the cell with Cantor index h."
+    self.state.update(h = h, n = {}, finished = [])
+    self.save()
+
+  def save(self):
+    now = time.monotonic()
+    self.state['elapsed'] = self.state.get('elapsed', 0.0) + (now - self._started)
+    self._started = now
+
+    self.path.parent.mkdir(parents = True, exist_ok = True)
+    temporary = self.path.with_name(self.path.name + '.tmp')
+    with temporary.open('w') as f:
+      json.dump(self.state, f, indent = 1)
+      f.flush()
+      os.fsync(f.fileno())
+    temporary.replace(self.path)
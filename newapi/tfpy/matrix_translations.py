@@ -1,23 +1,137 @@
+import io
 import numpy
 
+# Number of matrix rows formatted and written at a time.
+BLOCK_ROWS = 64
+
+def _cell_format(is_complex, accuracy, complex_format):
+  if is_complex:
+    return complex_format.format(accuracy = accuracy)
+  return f'{{:.{accuracy}}}'
+
+def _write_rows(array, f, cell_format, cell_separator, row_separator):
+  """Write a 2D array to the file-like object f, formatting a block of whole rows at a time.
+
+    Each row is formatted by a single str.format() call; complex cells take two arguments (the
+    real and imaginary parts), so cell_format must have two fields for complex arrays.
+  """
+  array = numpy.asarray(array)
+  if numpy.iscomplexobj(array):
+    cells = numpy.stack((array.real, array.imag), axis = -1).reshape(array.shape[0], -1)
+  else:
+    cells = array
+  row_format = cell_separator.join([cell_format]*array.shape[1])
+
+  for start in range(0, cells.shape[0], BLOCK_ROWS):
+    if start > 0:
+      f.write(row_separator)
+    f.write(row_separator.join(row_format.format(*row) for row in cells[start:start + BLOCK_ROWS].tolist()))
+
+def write_magma(array, f, accuracy = 32, unit = 'i'):
+  """Write a 2D array to f as the list of entries of a Magma matrix, row by row, one entry per line.
+
+    Parameters:
+      array -- the matrix.
+      f -- a file-like object with a write() method.
+      accuracy -- number of significant digits.
+      unit -- name of the imaginary unit in Magma.
+  """
+  cell_format = _cell_format(numpy.iscomplexobj(array), accuracy, '{{:.{accuracy}}} + {{:.{accuracy}}}*' + unit)
+  f.write('[\n    ')
+  _write_rows(array, f, cell_format, ',\n    ', ',\n    ')
+  f.write('\n]')
+
+def write_magma_matrix(array, f, var = 'V', field = 'CC', accuracy = 32, unit = 'i'):
+  "Write Magma code assigning the matrix to var, e.g. V:=Matrix(CC,d,n,[ ... ]);"
+  f.write(f'{var}:=Matrix({field},{array.shape[0]},{array.shape[1]},')
+  write_magma(array, f, accuracy, unit)
+  f.write(');\n')
+
+def write_matlab(array, f, accuracy = 32):
+  """Write a 2D array to f as a MATLAB matrix literal, one row per line.
+
+    Parameters:
+      array -- the matrix.
+      f -- a file-like object with a write() method.
+      accuracy -- number of significant digits.
+  """
+  cell_format = _cell_format(numpy.iscomplexobj(array), accuracy, '{{:.{accuracy}}}{{:+.{accuracy}}}i')
+  f.write('[')
+  _write_rows(array, f, cell_format, ', ', ';\n ')
+  f.write(']')
+
 def array_to_matlab(array, accuracy = 32):
-  string = "["
-  for row in array:
-    for cell in row:
-      string = string + str(cell) + ', '
-    string = string[:-2] # Remove trailing comma at end of row
-    string = string + ';\n '
-  string = string + ']'
-  return string
+  "Return a MATLAB matrix literal for a 2D array (see write_matlab())."
+  f = io.StringIO()
+  write_matlab(array, f, accuracy)
+  return f.getvalue()
 
 def array_to_magma(array, accuracy = 32):
-  d = array.shape[0]
-  n = array.shape[1]
-  matrix_rows = '['
-  for i in range(0,d):
-      for j in range(0,n):
-          matrix_rows = matrix_rows + f'    {array[i][j]:.{accuracy}}'
-          if not ((i == d - 1) and (j == n - 1)):
-              matrix_rows = matrix_rows + ',\n'
-  matrix_rows = matrix_rows + '\n]'
-  return matrix_rows
+  "Return the list of entries of a Magma matrix for a 2D array (see write_magma())."
+  f = io.StringIO()
+  write_magma(array, f, accuracy)
+  return f.getvalue()
+
+def read_mat_variables(path, names):
+  "Return a dictionary of the named variables of a .mat file, using h5py for v7.3 files."
+  import scipy.io
+  try:
+    return scipy.io.loadmat(path, variable_names = names)
+  except NotImplementedError:
+    # MATLAB v7.3 files are HDF5 files, with arrays stored transposed.
+    import h5py
+    variables = {}
+    with h5py.File(path, 'r') as f:
+      for name in names:
+        if name in f:
+          value = f[name][()]
+          if value.dtype.names is not None and 'real' in value.dtype.names:
+            value = value['real'] + 1j*value['imag']
+          variables[name] = numpy.asarray(value).T
+    return variables
+
+def _description(design):
+  return f'd = {design.d}, n = {design.n}, t = {design.t}, field = {design.field.value}, type = {design.design_type.value}, error = {design.error}'
+
+def export_designs(designs, f, language = 'magma', accuracy = 32):
+  """Write every design in an iterable (e.g. the result of DatabaseAdapter.search()) to f as one Magma or MATLAB file.
+
+    The designs are written one at a time, so the iterable can be a lazy search over a large
+    collection. In Magma, the k-th design is the matrix V_k over RR or CC (defined at the top of
+    the file) and the list designs holds them all; in MATLAB, designs{k} is a struct with
+    the parameters, error and matrix. Designs without a matrix are skipped.
+
+    Parameters:
+      designs -- an iterable of SphericalDesigns.
+      f -- a file-like object with a write() method.
+      language -- 'magma' or 'matlab'.
+      accuracy -- number of significant digits.
+
+    Returns the number of designs written.
+  """
+  if language not in ('magma', 'matlab'):
+    raise ValueError(f'Cannot export designs to {language}.')
+
+  if language == 'magma':
+    f.write(f'RR := RealField({accuracy});\nCC<i> := ComplexField({accuracy});\n\n')
+
+  count = 0
+  for design in designs:
+    if design.matrix is None:
+      continue
+    count = count + 1
+    if language == 'magma':
+      f.write(f'// {_description(design)}\n')
+      write_magma_matrix(design.matrix, f, f'V_{count}', 'CC' if numpy.iscomplexobj(design.matrix) else 'RR', accuracy)
+      f.write('\n')
+    else:
+      f.write(f'% {_description(design)}\n')
+      f.write(f"designs{{{count}}} = struct('d', {design.d}, 'n', {design.n}, 't', {design.t}, 'field', '{design.field.value}', "
+              f"'design_type', '{design.design_type.value}', 'error', {design.error if design.error is not None else '[]'}, 'matrix', ")
+      write_matlab(design.matrix, f, accuracy)
+      f.write(');\n\n')
+
+  if language == 'magma':
+    # A list rather than a sequence, since the matrices may be over different fields.
+    f.write(f'designs := [* {", ".join(f"V_{k}" for k in range(1, count + 1))} *];\n')
+  return count
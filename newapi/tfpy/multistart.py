@@ -0,0 +1,73 @@
+import tfpy.base
+import tfpy.potential
+from tfpy.NumpyAdapter import normalise, random_matrix
+import numpy
+
+def batch_descent(A, potential, iterations = 10000, threshold = 1e-10, step = 0.1, hopeless_ratio = 1e6, patience = 200):
+  """Run normalised gradient descent on a stack of K candidate designs at once.
+
+    Every iteration evaluates the gradient and the error of all live candidates with one batched
+    matmul each. Each candidate has its own step size, which grows after a successful step and
+    shrinks after a failed one. Candidates stop being iterated when they reach threshold, when
+    their step size underflows, or (after patience iterations) when their error is more than
+    hopeless_ratio times the best error in the stack.
+
+    Parameters:
+      A -- array of shape (K, d, n) of starting matrices.
+      potential -- a tfpy.potential.DesignPotential.
+      iterations -- maximum number of iterations.
+      threshold, step, hopeless_ratio, patience -- see above.
+
+    Returns (result, errors, iteration_counts): the final (K, d, n) stack, the K final errors,
+    and the number of iterations each candidate was live for.
+  """
+  A = normalise(numpy.array(A), potential.design_type)
+  K = A.shape[0]
+  errors = potential.compute_error(A)
+  steps = numpy.full(K, float(step))
+  counts = numpy.zeros(K, dtype = 'int64')
+  live = numpy.flatnonzero(errors >= threshold)
+
+  for h in range(iterations):
+    if live.size == 0:
+      break
+
+    grad = potential.compute_gradient(A[live])
+    norms = numpy.linalg.norm(grad, axis = (-2, -1), keepdims = True)
+    norms[norms == 0] = 1
+    trial = normalise(A[live] - steps[live, None, None]*grad/norms, potential.design_type)
+    trial_errors = potential.compute_error(trial)
+
+    better = trial_errors < errors[live]
+    A[live[better]] = trial[better]
+    errors[live[better]] = trial_errors[better]
+    steps[live] = numpy.where(better, steps[live]*1.5, steps[live]*0.5)
+    counts[live] += 1
+
+    keep = (errors[live] >= threshold) & (steps[live] > 1e-15)
+    if h >= patience:
+      keep &= errors[live] <= hopeless_ratio*errors.min()
+    live = live[keep]
+
+  return A, errors, counts
+
+def produce_designs(d, n, t, field, design_type, seeds = 64, count = 1, iterations = 10000, threshold = 1e-10, random_state = None, **kwargs):
+  """Search for a (d,n,t)-design from many random starting points simultaneously.
+
+    Parameters:
+      d, n, t -- design parameters.
+      field -- a tfpy.DesignField.
+      design_type -- a tfpy.DesignType.
+      seeds -- number of random starting matrices, K.
+      count -- number of designs to return.
+      iterations, threshold -- passed to batch_descent(), as is any other keyword argument.
+      random_state -- seed for numpy.random.default_rng (optional)
+
+    Returns a list of the count best SphericalDesigns found, in increasing order of error.
+  """
+  rng = numpy.random.default_rng(random_state)
+  potential = tfpy.potential.DesignPotential(d, n, t, field, design_type)
+  seed_matrices = random_matrix(d, n, field, rng, (seeds,))
+  result, errors, _ = batch_descent(seed_matrices, potential, iterations, threshold, **kwargs)
+
+  return [tfpy.base.SphericalDesign(d, n, t, field, design_type, result[i], float(errors[i])) for i in numpy.argsort(errors)[:count]]
@@ -0,0 +1,217 @@
+import tfpy.base
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import warnings
+
+class JobTimeout(tfpy.base.TFError):
+  """Exception set on the future of a produce_design() call that ran for too long (its worker is killed)."""
+  def __init__(self, parameters, timeout):
+    self.parameters = parameters
+    self.timeout = timeout
+
+  def __str__(self):
+    return f'JobTimeout: produce_design{self.parameters} did not finish within {self.timeout}s.'
+
+def matlab_adapter_factory():
+  "Adapter factory that starts a fresh MATLAB engine in each worker process."
+  from tfpy.MatlabAdapter import MatlabAdapter
+  return MatlabAdapter(existing = False)
+
+# The adapter owned by the current worker process, created by _initialise_worker(), and the queue
+# on which the worker announces the jobs it starts (None if the pool has no timeout).
+_worker_adapter = None
+_started = None
+
+def _initialise_worker(adapter_factory, started):
+  global _worker_adapter, _started
+  _started = started
+  _worker_adapter = adapter_factory().__enter__()
+  # Finalizers (unlike atexit handlers) are run when a multiprocessing worker exits.
+  Finalize(None, _worker_adapter.__exit__, args = (None, None, None), exitpriority = 10)
+
+def _produce(job, parameters, seed = None):
+  if _started is not None:
+    _started.put((job, os.getpid()))
+  if seed is None:
+    design = _worker_adapter.produce_design(*parameters)
+  else:
+    design = _worker_adapter.produce_design(*parameters, seed = seed)
+  # The adapter stays in the worker, so its iteration count travels back with the design.
+  design.iterations = getattr(_worker_adapter, 'last_iterations', None)
+  return design
+
+class WorkerPool(object):
+  """A pool of worker processes that each own one adapter and call its produce_design().
+
+    This class is a context manager; leaving the context (or closing a generator returned by
+    produce()) cancels every job that has not started yet and waits for the running ones.
+
+    The timeout is enforced by the parent process, since a blocking call such as a MATLAB engine
+    call cannot be interrupted inside the worker: each worker announces the jobs it starts, and a
+    watchdog thread kills a worker whose job runs for longer than the timeout. The future of
+    that job gets a JobTimeout. Killing a worker breaks the underlying ProcessPoolExecutor, so a
+    new one is started (with new adapters) and the other unfinished jobs are submitted again.
+
+  """
+  # How often the watchdog checks the running jobs, in seconds.
+  WATCHDOG_INTERVAL = 0.1
+
+  # Number of times a job is resubmitted after its pool broke before its future fails.
+  MAX_RETRIES = 2
+
+  def __init__(self, workers, adapter_factory = matlab_adapter_factory, timeout = None):
+    """
+      Parameters: workers -- number of worker processes
+                  adapter_factory -- picklable callable returning a fresh adapter in each worker,
+                                     e.g. tfpy.NumpyAdapter (default: start a MATLAB engine per worker)
+                  timeout -- seconds after which a single produce_design() call is abandoned and
+                             its worker killed (optional)
+    """
+    self.workers = workers
+    self.adapter_factory = adapter_factory
+    self.timeout = timeout
+    self._executor = None
+    self._started = None
+    self._watchdog = None
+    self._lock = threading.RLock()
+    self._jobs = {} # Job number -> [future, parameters, seed, inner future, executor, retries]
+    self._running = {} # Job number -> (worker pid, start time), for jobs a worker has started.
+    self._count = 0
+    self._closing = False
+
+  def _start_executor(self):
+    self._executor = ProcessPoolExecutor(self.workers, initializer = _initialise_worker, initargs = (self.adapter_factory, self._started))
+
+  def __enter__(self):
+    if self.timeout is not None:
+      self._started = multiprocessing.Queue()
+      self._watchdog = threading.Thread(target = self._watch, daemon = True)
+      self._watchdog.start()
+    self._start_executor()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    # The watchdog keeps running while we wait, so a hung job is killed after the timeout.
+    with self._lock:
+      self._closing = True
+      executor = self._executor
+    executor.shutdown(wait = True, cancel_futures = True)
+    if self._watchdog is not None:
+      self._watchdog.join()
+    return False
+
+  def _dispatch(self, job):
+    "Submit a job to the current executor; the caller holds the lock."
+    entry = self._jobs[job]
+    inner = self._executor.submit(_produce, job, entry[1], entry[2])
+    entry[3], entry[4] = inner, self._executor
+    inner.add_done_callback(lambda inner: self._finished(job, inner))
+
+  def _settle(self, future, result = None, exception = None):
+    "Set the result or exception of one of our futures, unless it was cancelled meanwhile."
+    try:
+      if exception is not None:
+        future.set_exception(exception)
+      else:
+        future.set_result(result)
+    except InvalidStateError:
+      pass
+
+  def _finished(self, job, inner):
+    with self._lock:
+      entry = self._jobs.get(job)
+      if entry is None or entry[3] is not inner:
+        return # Timed out, or already submitted again.
+      self._running.pop(job, None)
+      exception = None if inner.cancelled() else inner.exception()
+      if isinstance(exception, BrokenProcessPool) and not self._closing and entry[5] < self.MAX_RETRIES and not entry[0].cancelled():
+        # A worker was killed (or died); start a new pool if that has not happened yet, and run the job again.
+        if entry[4] is self._executor:
+          self._executor.shutdown(wait = False, cancel_futures = True)
+          self._start_executor()
+        entry[5] = entry[5] + 1
+        self._dispatch(job)
+        return
+      del self._jobs[job]
+    if inner.cancelled():
+      entry[0].cancel()
+    else:
+      self._settle(entry[0], None if exception is not None else inner.result(), exception)
+
+  def _watch(self):
+    while True:
+      announcements = []
+      try:
+        announcements.append(self._started.get(timeout = self.WATCHDOG_INTERVAL))
+        while True:
+          announcements.append(self._started.get_nowait())
+      except queue.Empty:
+        pass
+      except (EOFError, OSError):
+        return
+
+      now = time.monotonic()
+      with self._lock:
+        for job, pid in announcements:
+          if job in self._jobs:
+            self._running[job] = (pid, now)
+        expired = [(job, pid) for job, (pid, start) in self._running.items() if now - start > self.timeout]
+        timed_out = []
+        for job, pid in expired:
+          del self._running[job]
+          timed_out.append((self._jobs.pop(job), pid))
+        done = self._closing and not self._jobs
+
+      for entry, pid in timed_out:
+        try:
+          os.kill(pid, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+          pass
+        self._settle(entry[0], exception = JobTimeout(entry[1], self.timeout))
+      if done:
+        return
+
+  def submit(self, d, n, t, field, design_type, seed = None):
+    """Return a future of the SphericalDesign produced by a worker, optionally starting from the matrix seed.
+
+      The design's iterations attribute is set to the last_iterations of the worker's adapter
+      (None if the adapter does not count them).
+    """
+    future = Future()
+    with self._lock:
+      job = self._count
+      self._count = self._count + 1
+      self._jobs[job] = [future, (d, n, t, field, design_type), seed, None, None, 0]
+      self._dispatch(job)
+    future.add_done_callback(lambda future: self._cancel(job) if future.cancelled() else None)
+    return future
+
+  def _cancel(self, job):
+    with self._lock:
+      entry = self._jobs.get(job)
+    if entry is not None and entry[3] is not None:
+      entry[3].cancel() # Jobs already running carry on (and are still killed after the timeout).
+
+  def produce(self, parameter_list, ordered = True):
+    """Produce a design for every (d, n, t, field, design_type) tuple in parameter_list.
+
+      Designs are yielded in the order of parameter_list if ordered is set, and as soon as they
+      are finished otherwise. Jobs that hit the timeout are skipped.
+    """
+    futures = [self.submit(*parameters) for parameters in parameter_list]
+    try:
+      for future in (futures if ordered else as_completed(futures)):
+        try:
+          yield future.result()
+        except JobTimeout as e:
+          warnings.warn(str(e))
+    finally:
+      for future in futures:
+        future.cancel()
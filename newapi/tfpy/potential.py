@@ -0,0 +1,87 @@
+import tfpy.base
+from scipy.special import comb as nchoosek
+import numpy
+
+def design_coefficient(d, t, field):
+  """Return the constant c(d,t) such that c*sum(|G|^2t) >= (sum(diag(G)^t))^2, with equality exactly for t-designs.
+
+    This is the `coefficient' property of DesignParameters.m, RealDesignPotential.m and
+    ComplexDesignPotential.m.
+  """
+  if field == tfpy.base.DesignField.REAL:
+    return numpy.prod(numpy.arange(d, d + 2*t - 1, 2, dtype = 'float64'))/numpy.prod(numpy.arange(1, 2*t, 2, dtype = 'float64'))
+  elif field == tfpy.base.DesignField.COMPLEX:
+    return float(nchoosek(d + t - 1, t, exact = True))
+  else:
+    assert False # Should never get here.
+
+class DesignPotential(object):
+  """The frame potential whose zeros are the spherical (t,t)-designs, and its gradient, in NumPy.
+
+    This computes the same numbers as the computeError and computeGradient methods of the
+    MATLAB class DesignParameters (newapi/matlab), or of RealDesignPotential and
+    ComplexDesignPotential (matlab/) if normalisation_term is set. Every method works on a
+    single d x n matrix or on a stack of them of shape (..., d, n).
+
+    Attributes:
+        d, n, t (int): design parameters.
+        field (base.DesignField): the field the design is over.
+        design_type (base.DesignType): the type of design.
+        coefficient (float): the constant from design_coefficient().
+        normalisation_term (bool): whether to add (G_11 - 1)^2 to the error, which pins the
+                                   length of the first vector.
+  """
+
+  def __init__(self, d, n, t, field, design_type, normalisation_term = False):
+    self.d = int(d)
+    self.n = int(n)
+    self.t = int(t)
+    self.field = field
+    self.design_type = design_type
+    self.normalisation_term = normalisation_term
+    self.coefficient = design_coefficient(self.d, self.t, field)
+
+  def _check(self, S):
+    S = numpy.asarray(S)
+    if S.shape[-2:] != (self.d, self.n):
+      raise tfpy.base.DimensionError((self.d, self.n), S.shape)
+    return S
+
+  @staticmethod
+  def gramian(S):
+    "Return S'*S for a matrix or a stack of matrices."
+    return numpy.matmul(S.conj().swapaxes(-1, -2), S)
+
+  def compute_error(self, S):
+    "Return the error of the design S (or an array of errors for a stack of designs)."
+    S = self._check(S)
+    gram = self.gramian(S)
+    diagonal = numpy.diagonal(gram, axis1 = -2, axis2 = -1).real
+    error = numpy.abs(self.coefficient*numpy.sum(numpy.abs(gram)**(2*self.t), axis = (-2, -1)) - numpy.sum(diagonal**self.t, axis = -1)**2)
+    if self.normalisation_term:
+      error = error + (diagonal[..., 0] - 1)**2
+    return error
+
+  def compute_gradient(self, S):
+    """Return the Euclidean gradient of compute_error() at S.
+
+      For complex designs this is the gradient on R^(2dn), written as a complex matrix, which is
+      what Manopt calls the egrad.
+    """
+    S = self._check(S)
+    t = self.t
+    gram = self.gramian(S)
+    diagonal = numpy.diagonal(gram, axis1 = -2, axis2 = -1).real
+
+    # The MATLAB loops compute sum_j |G_cj|^(2t-2) G_jc S_rj for each (r,c), i.e. S*M below.
+    M = numpy.abs(gram)**(2*t - 2) * gram
+    trace_term = numpy.sum(diagonal**t, axis = -1)[..., None, None]
+    grad = 4*self.coefficient*t*numpy.matmul(S, M) - 4*t*trace_term*(diagonal**(t - 1))[..., None, :]*S
+    if self.normalisation_term:
+      grad[..., :, 0] += 4*(diagonal[..., 0, None] - 1)*S[..., :, 0]
+    return grad
+
+  @classmethod
+  def for_design(cls, design, normalisation_term = False):
+    "Construct the potential with the same parameters as the SphericalDesign design."
+    return cls(design.d, design.n, design.t, design.field, design.design_type, normalisation_term)
@@ -0,0 +1,109 @@
+from collections import namedtuple
+import numpy
+
+# Default cap on the size of a single block of triple products, in bytes.
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+def block_rows(n, itemsize, max_bytes = DEFAULT_MAX_BYTES):
+  "Number of values of i per block so that an (i, n, n) block of values fits into max_bytes."
+  return max(1, min(n, int(max_bytes // max(1, n * n * itemsize))))
+
+def triple_product_blocks(gramian, max_bytes = DEFAULT_MAX_BYTES):
+  """Yield the triple products G_ij G_jk G_ki of a Gram matrix in blocks of i.
+
+    Each block is an array of shape (b, n, n) holding the products for b consecutive values
+    of i, so that concatenating the flattened blocks gives the products in the same (i, j, k)
+    order as the loop in compute_triple_products.m.
+
+    Parameters:
+      gramian -- the n x n Gram matrix of the design.
+      max_bytes -- upper bound on the memory used by a single block.
+  """
+  gramian = numpy.asarray(gramian)
+  n = gramian.shape[0]
+  step = block_rows(n, gramian.dtype.itemsize, max_bytes)
+  transpose = gramian.T
+  for start in range(0, n, step):
+    stop = min(n, start + step)
+    # block[i,j,k] = G[i,j] * G[j,k] * G[k,i]
+    block = gramian[start:stop, :, None] * gramian[None, :, :]
+    block *= transpose[start:stop, None, :]
+    yield block
+
+def compute_triple_products(gramian, max_bytes = DEFAULT_MAX_BYTES):
+  """Return the sorted array of all n^3 triple products of a Gram matrix.
+
+    Parameters:
+      gramian -- the n x n Gram matrix of the design.
+      max_bytes -- upper bound on the memory used by a single intermediate block; the result
+                   itself always takes n^3 values.
+  """
+  gramian = numpy.asarray(gramian)
+  n = gramian.shape[0]
+  products = numpy.empty(n**3, dtype = gramian.dtype)
+  offset = 0
+  for block in triple_product_blocks(gramian, max_bytes):
+    products[offset:offset + block.size] = block.ravel()
+    offset = offset + block.size
+  products.sort()
+  return products
+
+TripleProductStatistics = namedtuple('TripleProductStatistics',
+                                     ['count', 'histogram', 'bin_edges', 'values', 'multiplicities', 'minimum', 'maximum', 'top'])
+TripleProductStatistics.__doc__ = """Summary of the triple products of a design, as returned by triple_product_statistics().
+
+  Attributes:
+      count (int): total number of products, n^3.
+      histogram (numpy.array): number of products whose absolute value falls in each bin.
+      bin_edges (numpy.array): the bins + 1 edges of the histogram, from 0 to max(G_ii)^3.
+      values (numpy.array): the distinct products after rounding to the requested accuracy, sorted.
+      multiplicities (numpy.array): how often each entry of values occurs.
+      minimum, maximum (float): smallest and largest absolute value of a product.
+      top (numpy.array): the largest absolute values of the products, in decreasing order.
+"""
+
+def triple_product_statistics(gramian, accuracy = 6, bins = 100, top_k = 10, max_bytes = DEFAULT_MAX_BYTES):
+  """Summarise the triple products of a Gram matrix in one blocked pass, without storing all n^3 of them.
+
+    Parameters:
+      gramian -- the n x n Gram matrix of the design.
+      accuracy -- number of decimal places to round to when identifying distinct products.
+      bins -- number of equal-width histogram bins for the absolute values of the products.
+      top_k -- number of largest absolute values to keep.
+      max_bytes -- upper bound on the memory used by a single block.
+
+    Returns a TripleProductStatistics. Memory use is O(n^2 + distinct values) on top of one block.
+  """
+  gramian = numpy.asarray(gramian)
+
+  # |G_ij| <= sqrt(G_ii G_jj), so every product is bounded by the largest diagonal entry cubed.
+  bound = numpy.max(numpy.abs(numpy.diagonal(gramian)))**3 if gramian.size > 0 else 0.0
+  bin_edges = numpy.linspace(0, bound if bound > 0 else 1.0, bins + 1)
+  histogram = numpy.zeros(bins, dtype = 'int64')
+  distinct = {}
+  minimum = numpy.inf
+  maximum = -numpy.inf
+  top = numpy.empty(0)
+  count = 0
+
+  for block in triple_product_blocks(gramian, max_bytes):
+    values = block.ravel()
+    absolute = numpy.abs(values)
+    count = count + values.size
+
+    histogram += numpy.histogram(numpy.clip(absolute, 0, bin_edges[-1]), bin_edges)[0]
+    minimum = min(minimum, absolute.min())
+    maximum = max(maximum, absolute.max())
+
+    if top_k > 0:
+      candidates = numpy.concatenate((top, absolute if absolute.size <= top_k else numpy.partition(absolute, -top_k)[-top_k:]))
+      top = numpy.sort(candidates)[::-1][:top_k]
+
+    # Adding 0 turns any -0.0 produced by rounding into 0.0 so that they are counted together.
+    unique, counts = numpy.unique(numpy.round(values, accuracy) + 0, return_counts = True)
+    for value, multiplicity in zip(unique.tolist(), counts.tolist()):
+      distinct[value] = distinct.get(value, 0) + multiplicity
+
+  values = numpy.sort(numpy.array(list(distinct.keys()), dtype = gramian.dtype))
+  multiplicities = numpy.array([distinct[value] for value in values.tolist()], dtype = 'int64')
+  return TripleProductStatistics(count, histogram, bin_edges, values, multiplicities, float(minimum), float(maximum), top)
@@ -0,0 +1,411 @@
+import struct
+import zlib
+import numpy
+import tfpy.storage
+from tfpy.matrix_translations import read_mat_variables
+
+# Number of primitives formatted and written at a time.
+BLOCK_SIZE = 256
+
+# Centimetres per TeX point; pictures are measured in centimetres, as in TikZ.
+PT = 2.54/72.27
+
+# TikZ line widths in pt.
+LINE_WIDTHS = {'thin': 0.4, 'very thick': 1.2, 'ultra thick': 1.6}
+
+# RGB values of the named colours used in pictures.
+NAMED_COLOURS = {'black': (0.0, 0.0, 0.0), 'lightgray': (0.75, 0.75, 0.75)}
+
+# Radius of a point drawn as \node[circle,inner sep=1.2pt] (the inner sep plus half the line width).
+POINT_RADIUS = 1.4*PT
+
+def load_matrix(path):
+  "Read the result matrix of a .mat file written by the MATLAB scripts, without MATLAB."
+  variables = read_mat_variables(path, ['result'])
+  if 'result' not in variables:
+    raise KeyError(f'No result array in {path}.')
+  return numpy.asarray(variables['result'])
+
+def load_design(location, d, n, t, field = None, design_type = None):
+  """Return the matrix of the stored (d,n,t)-design with the smallest error.
+
+    Parameters:
+      location -- a mongodb:// URI or the path of a local store (see tfpy.open_storage()).
+      d, n, t -- the parameters of the design.
+      field -- only consider designs over this DesignField.
+      design_type -- only consider designs of this DesignType.
+  """
+  search = {'d': d, 'n': n, 't': t}
+  if field is not None:
+    search['field'] = field
+  if design_type is not None:
+    search['design_type'] = design_type
+  with tfpy.storage.open_storage(location) as db:
+    designs = [design for design in db.search(**search) if design.matrix is not None]
+    if not designs:
+      raise KeyError(f'No stored ({d},{n},{t})-design.')
+    return min(designs, key = lambda design: float('inf') if design.error is None else design.error).matrix
+
+def design_colours(n, random_state = None):
+  """Return n colours of evenly spaced hue as an (n, 3) array of RGB values in [0, 1].
+
+    The lightness and saturation are jittered slightly, so that the colours of large designs
+    stay distinguishable.
+  """
+  rng = numpy.random.default_rng(random_state)
+  hue = numpy.arange(n)/max(n, 1)
+  lightness = 0.5 + rng.random(n)/100
+  saturation = 0.9 + rng.random(n)/100
+
+  # colorsys.hls_to_rgb(), on arrays.
+  m2 = numpy.where(lightness <= 0.5, lightness*(1 + saturation), lightness + saturation - lightness*saturation)
+  m1 = 2*lightness - m2
+  def channel(h):
+    h = h % 1.0
+    return numpy.select([h < 1/6, h < 0.5, h < 2/3], [m1 + (m2 - m1)*h*6, m2, m1 + (m2 - m1)*(2/3 - h)*6], m1)
+  return numpy.stack([channel(hue + 1/3), channel(hue), channel(hue - 1/3)], axis = 1)
+
+class Picture(object):
+  """A drawing made of layers of points, arrows, polygons and labels, in centimetres with y pointing up.
+
+    Each layer holds the coordinates of all its primitives in one array, so that a whole row of a
+    design is projected at once and the writers can format a block of primitives at a time.
+    Layers are drawn in the order they were added. Colours are either the name of a colour in
+    NAMED_COLOURS or an array with one RGB row per primitive.
+
+  Attributes:
+      precision (int): number of significant digits of coordinates in TikZ output.
+      layers (list): the layers, as tuples starting with 'points', 'arrows', 'polygon' or 'label'.
+  """
+
+  def __init__(self, precision = 3):
+    self.precision = precision
+    self.layers = []
+
+  def points(self, xy, colours):
+    "Add a dot at each row of the (k, 2) array xy."
+    self.layers.append(('points', numpy.asarray(xy, dtype = float).reshape(-1, 2), colours))
+
+  def arrows(self, start, end, colours, thickness = 'thin'):
+    "Add an arrow from each row of start to the same row of end; thickness is a key of LINE_WIDTHS."
+    start, end = numpy.broadcast_arrays(numpy.asarray(start, dtype = float), numpy.asarray(end, dtype = float))
+    self.layers.append(('arrows', numpy.hstack((start.reshape(-1, 2), end.reshape(-1, 2))), colours, thickness))
+
+  def polygon(self, xy, colour, opacity = 1.0):
+    "Add a filled polygon with the rows of xy as corners."
+    self.layers.append(('polygon', numpy.asarray(xy, dtype = float).reshape(-1, 2), colour, opacity))
+
+  def label(self, xy, text, anchor = 'above'):
+    "Add a label (in TeX) next to the point xy; anchor is 'above' or 'right'."
+    self.layers.append(('label', numpy.asarray(xy, dtype = float).reshape(2), text, anchor))
+
+  def bounds(self, margin = 0.5):
+    "Return (xmin, ymin, xmax, ymax) of everything in the picture, widened by margin."
+    corners = [layer[1][:, :2] for layer in self.layers if layer[0] != 'label'] \
+            + [layer[1][:, 2:] for layer in self.layers if layer[0] == 'arrows'] \
+            + [layer[1][None] for layer in self.layers if layer[0] == 'label']
+    corners = numpy.vstack(corners) if corners else numpy.zeros((1, 2))
+    low, high = corners.min(axis = 0) - margin, corners.max(axis = 0) + margin
+    return low[0], low[1], high[0], high[1]
+
+def project_2d(matrix, scale = 4, multi_axis = False, rays = False, domestic_lines = False, international_lines = False, colours = None):
+  """Draw a design as points in the complex plane, one plane per coordinate or all on one plane.
+
+    The j-th point on the i-th plane is the i-th coordinate of the j-th vector of the design.
+
+    Parameters:
+      matrix -- the d x n matrix of the design.
+      scale -- radius of the unit circle in cm.
+      multi_axis -- draw a separate plane per coordinate.
+      rays -- draw a ray from the origin to each point.
+      domestic_lines -- draw a cycle through the points of each coordinate.
+      international_lines -- draw coloured lines between the coordinates of each vector.
+      colours -- an (n, 3) array of RGB colours of the vectors (default: design_colours(n)).
+  """
+  matrix = numpy.asarray(matrix)
+  d, n = matrix.shape
+  colours = design_colours(n) if colours is None else colours
+  offsets = 2.5*scale*numpy.arange(d) if multi_axis else numpy.zeros(d)
+  xy = numpy.stack((matrix.real*scale + offsets[:, None], matrix.imag*scale), axis = -1) # d x n x 2
+
+  picture = Picture(precision = 3)
+  for i in range(d):
+    if multi_axis or i == 0:
+      origin = numpy.array([offsets[i], 0.0])
+      starts = origin + [[-scale, 0], [0, -scale]]
+      ends = origin + [[scale, 0], [0, scale]]
+      picture.arrows(starts, ends, 'lightgray', 'ultra thick')
+      picture.label(ends[0], f'$x_{i+1}$', 'right')
+      picture.label(ends[1], f'$y_{i+1}$', 'above')
+
+    picture.points(xy[i], colours)
+    if rays:
+      picture.arrows([offsets[i], 0.0], xy[i], 'lightgray', 'thin')
+    if international_lines and i > 0:
+      picture.arrows(xy[i - 1], xy[i], colours, 'very thick')
+    if domestic_lines:
+      picture.arrows(numpy.roll(xy[i], 1, axis = 0), xy[i], 'black', 'thin')
+  return picture
+
+def project_3d(matrix, scale = 4, colours = None):
+  """Draw a design as a stack of complex planes, one per coordinate, seen in perspective.
+
+    The i-th coordinates of the vectors are placed on the plane z = i + 1 and projected from the
+    point (-2, -6, d + 2) onto the plane y = 2; coloured arrows join the coordinates of each vector.
+
+    Parameters:
+      matrix -- the d x n matrix of the design.
+      scale -- scaling factor of the picture.
+      colours -- an (n, 3) array of RGB colours of the vectors (default: design_colours(n)).
+  """
+  matrix = numpy.asarray(matrix)
+  d, n = matrix.shape
+  colours = design_colours(n) if colours is None else colours
+  centre = numpy.array([-2.0, -6.0, d + 2.0])
+  plane_y = 2.0
+
+  def project(points):
+    "Project an array of points (in the last axis) and return their (x, z) coordinates."
+    l = (plane_y - centre[1])/(points[..., 1:2] - centre[1])
+    return (scale*(l*(points - centre) + centre))[..., [0, 2]]
+
+  heights = numpy.arange(1, d + 1, dtype = float)[:, None] + numpy.zeros((1, n))
+  projected = project(numpy.stack((matrix.real, matrix.imag, heights), axis = -1)) # d x n x 2
+
+  # Ends of the axes of each plane: y from -1 to 1, then x from -1 to 1.
+  axes = numpy.array([[0, -1, 0], [0, 1, 0], [-1, 0, 0], [1, 0, 0]], dtype = float)
+  axes = project(axes[None] + numpy.arange(1, d + 1)[:, None, None]*[0, 0, 1]) # d x 4 x 2
+
+  picture = Picture(precision = 4)
+  for i in range(d):
+    a = axes[i]
+    # Where the projected axes cross, to centre the shaded square on.
+    (x1, z1), (x2, z2), (x3, z3), (x4, z4) = a
+    l = ((z1 - z3)*(x4 - x3) + (x3 - x1)*(z4 - z3))/((x2 - x1)*(z2 - z3) - (z2 - z1)*(x4 - x3))
+    middle = l*(a[1] - a[0]) + a[0]
+    picture.polygon(numpy.array([a[1] + a[2], a[1] + a[3], a[0] + a[3], a[0] + a[2]]) - middle, 'lightgray', 0.8)
+
+    picture.points(projected[i], colours)
+    picture.arrows(a[[0, 2]], a[[1, 3]], 'lightgray', 'thin')
+    picture.label(a[1], f'$y_{i+1}$', 'above')
+    picture.label(a[3], f'$x_{i+1}$', 'right')
+    if i < d - 1:
+      picture.arrows(projected[i], projected[i + 1], colours, 'very thick') # Painted on top of the axes.
+  return picture
+
+def _write_blocks(f, row_format, rows):
+  "Write one line per row of a 2D array, formatting a block of rows at a time."
+  for start in range(0, len(rows), BLOCK_SIZE):
+    f.write(''.join(row_format.format(*row) for row in rows[start:start + BLOCK_SIZE].tolist()))
+
+def _tikz_colours(colours, count):
+  "Return a format fragment and the columns to fill it with for the colours of a layer."
+  if isinstance(colours, str):
+    return colours.replace('{', '{{').replace('}', '}}'), numpy.zeros((count, 0))
+  return '{{{{rgb:red,{{:.{p}}};green,{{:.{p}}};blue,{{:.{p}}}}}}}', numpy.asarray(colours, dtype = float)/3.0
+
+def write_tikz(picture, f):
+  """Write a picture to f as a standalone LaTeX document with one tikzpicture, a block of lines at a time.
+
+    Parameters:
+      picture -- a Picture, e.g. from project_2d() or project_3d().
+      f -- a file-like object with a write() method.
+  """
+  p = picture.precision
+  f.write('\\documentclass{standalone}\n\\usepackage{tikz}\n\\begin{document}\n    \\begin{tikzpicture}\n')
+  for layer in picture.layers:
+    kind, xy = layer[0], layer[1]
+    if kind == 'points':
+      colour, columns = _tikz_colours(layer[2], len(xy))
+      row_format = f'        \\node at ({{:.{p}}},{{:.{p}}})[circle,fill={colour.format(p = p)},inner sep=1.2pt]{{{{}}}};\n'
+      _write_blocks(f, row_format, numpy.hstack((xy, columns)))
+    elif kind == 'arrows':
+      colour, columns = _tikz_colours(layer[2], len(xy))
+      row_format = f'        \\draw[->, {layer[3]}, color={colour.format(p = p)}] ({{:.{p}}},{{:.{p}}}) -- ({{:.{p}}}, {{:.{p}}});\n'
+      _write_blocks(f, row_format, numpy.hstack((columns, xy)))
+    elif kind == 'polygon':
+      corners = '--'.join(f'({x:.{p}},{y:.{p}})' for x, y in xy.tolist())
+      f.write(f'        \\draw[fill={layer[2]}, opacity={layer[3]}] {corners}--cycle;\n')
+    elif kind == 'label':
+      f.write(f'        \\node[{layer[3]}] at ({xy[0]:.{p}},{xy[1]:.{p}}) {{{layer[2]}}};\n')
+  f.write('   \\end{tikzpicture}\n\\end{document}\n')
+
+def _rgb(colours, count):
+  "Return the colours of a layer as a (count, 3) array."
+  if isinstance(colours, str):
+    return numpy.tile(NAMED_COLOURS[colours], (count, 1))
+  return numpy.asarray(colours, dtype = float).reshape(count, 3)
+
+def _arrow_heads(segments, width):
+  """Return the two barbs of the arrow head of each segment, as segments (in the same units).
+
+    The barbs are lines back from the tip at 35 degrees to the shaft, of a length growing with the
+    line width, like TikZ's default arrow tip.
+  """
+  length = 2.5*PT + 2.5*width
+  direction = segments[:, 2:] - segments[:, :2]
+  norms = numpy.linalg.norm(direction, axis = 1, keepdims = True)
+  direction = numpy.divide(direction, norms, out = numpy.zeros_like(direction), where = norms > 0)
+  c, s = numpy.cos(numpy.radians(35)), numpy.sin(numpy.radians(35))
+  tips = segments[:, 2:]
+  left = tips - length*numpy.stack((c*direction[:, 0] - s*direction[:, 1], s*direction[:, 0] + c*direction[:, 1]), axis = 1)
+  right = tips - length*numpy.stack((c*direction[:, 0] + s*direction[:, 1], -s*direction[:, 0] + c*direction[:, 1]), axis = 1)
+  return numpy.vstack((numpy.hstack((tips, left)), numpy.hstack((tips, right))))
+
+def _hex_colours(rgb):
+  return ['#{:02x}{:02x}{:02x}'.format(*row) for row in numpy.rint(numpy.clip(rgb, 0, 1)*255).astype(int).tolist()]
+
+def write_svg(picture, f):
+  """Write a picture to f as an SVG image, a block of elements at a time.
+
+    Labels are written as plain text, without the TeX markup.
+
+    Parameters:
+      picture -- a Picture, e.g. from project_2d() or project_3d().
+      f -- a file-like object with a write() method.
+  """
+  xmin, ymin, xmax, ymax = picture.bounds()
+  f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{xmax - xmin:.3f}cm" height="{ymax - ymin:.3f}cm" '
+          f'viewBox="{xmin:.4f} {-ymax:.4f} {xmax - xmin:.4f} {ymax - ymin:.4f}">\n<rect x="{xmin:.4f}" y="{-ymax:.4f}" '
+          f'width="{xmax - xmin:.4f}" height="{ymax - ymin:.4f}" fill="white"/>\n')
+  for layer in picture.layers:
+    kind, xy = layer[0], layer[1]
+    if kind == 'points':
+      rows = numpy.column_stack((xy[:, 0], -xy[:, 1]))
+      colours = _hex_colours(_rgb(layer[2], len(xy)))
+      for start in range(0, len(rows), BLOCK_SIZE):
+        f.write(''.join(f'<circle cx="{x:.4f}" cy="{y:.4f}" r="{POINT_RADIUS:.4f}" fill="{colour}"/>\n'
+                        for (x, y), colour in zip(rows[start:start + BLOCK_SIZE].tolist(), colours[start:start + BLOCK_SIZE])))
+    elif kind == 'arrows':
+      width = LINE_WIDTHS[layer[3]]*PT
+      heads = _arrow_heads(xy, width)
+      count = len(xy)
+      rows = numpy.hstack((xy, heads[:count, 2:], heads[count:, 2:]))*[1, -1, 1, -1, 1, -1, 1, -1]
+      colours = _hex_colours(_rgb(layer[2], count))
+      row_format = ('<path d="M{:.4f} {:.4f}L{:.4f} {:.4f}M{:.4f} {:.4f}L{:.4f} {:.4f}L{:.4f} {:.4f}" fill="none" '
+                    f'stroke-width="{width:.4f}" stroke-linecap="round" stroke="{{}}"/>\n')
+      for start in range(0, count, BLOCK_SIZE):
+        f.write(''.join(row_format.format(*row[:4], *row[4:6], *row[2:4], *row[6:8], colour)
+                        for row, colour in zip(rows[start:start + BLOCK_SIZE].tolist(), colours[start:start + BLOCK_SIZE])))
+    elif kind == 'polygon':
+      corners = ' '.join(f'{x:.4f},{-y:.4f}' for x, y in xy.tolist())
+      f.write(f'<polygon points="{corners}" fill="{_hex_colours(_rgb(layer[2], 1))[0]}" fill-opacity="{layer[3]}" stroke="black" stroke-width="{0.4*PT:.4f}"/>\n')
+    elif kind == 'label':
+      text = layer[2].replace('$', '').replace('{', '').replace('}', '').replace('&', '&amp;').replace('<', '&lt;')
+      dx, dy, anchor = (0.1, 0.0, 'start') if layer[3] == 'right' else (0.0, -0.1, 'middle')
+      f.write(f'<text x="{xy[0] + dx:.4f}" y="{-xy[1] + dy:.4f}" font-size="0.35" font-style="italic" text-anchor="{anchor}">{text}</text>\n')
+  f.write('</svg>\n')
+
+class _Canvas(object):
+  "An 8-bit RGB image with the drawing operations needed to rasterise a Picture."
+
+  def __init__(self, bounds, dpi):
+    self.xmin, self.ymin, xmax, self.ymax = bounds
+    self.scale = dpi/2.54 # Pixels per cm.
+    self.width = int(numpy.ceil((xmax - self.xmin)*self.scale))
+    self.height = int(numpy.ceil((self.ymax - self.ymin)*self.scale))
+    self.image = numpy.full((self.height, self.width, 3), 255, dtype = numpy.uint8)
+
+  def pixels(self, xy):
+    "Convert (k, 2) picture coordinates to (column, row) pixel coordinates."
+    return numpy.column_stack(((xy[:, 0] - self.xmin)*self.scale, (self.ymax - xy[:, 1])*self.scale))
+
+  def stamp(self, centres, radius, colours):
+    "Paint a disc of the given radius (in pixels) around each centre, in colours given as (k, 3) RGB values in [0, 1]."
+    r = int(numpy.ceil(radius))
+    dy, dx = numpy.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx**2 + dy**2 <= max(radius, 0.5)**2
+    dx, dy = dx[inside], dy[inside]
+    columns = (numpy.rint(centres[:, 0]).astype(int)[:, None] + dx).ravel()
+    rows = (numpy.rint(centres[:, 1]).astype(int)[:, None] + dy).ravel()
+    visible = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+    colours = numpy.rint(numpy.clip(colours, 0, 1)*255).astype(numpy.uint8)
+    which = numpy.repeat(numpy.arange(len(centres)), len(dx))[visible]
+    self.image.reshape(-1, 3)[rows[visible]*self.width + columns[visible]] = colours[which]
+
+  def segments(self, segments, width, colours):
+    "Paint lines of the given width (in pixels) by stamping discs every pixel along them."
+    start, end = segments[:, :2], segments[:, 2:]
+    counts = numpy.ceil(numpy.linalg.norm(end - start, axis = 1)).astype(int) + 1
+    which = numpy.repeat(numpy.arange(len(segments)), counts)
+    steps = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    fraction = (steps/numpy.maximum(counts - 1, 1)[which])[:, None]
+    self.stamp(start[which] + fraction*(end - start)[which], width/2, colours[which])
+
+  def polygon(self, corners, colour, opacity):
+    "Blend a filled polygon into the image, one span per pair of edge crossings on each row (even-odd rule)."
+    top = max(int(numpy.floor(corners[:, 1].min())), 0)
+    bottom = min(int(numpy.ceil(corners[:, 1].max())), self.height)
+    if bottom <= top:
+      return
+    y = numpy.arange(top, bottom)[:, None] + 0.5
+    (x1, y1), (x2, y2) = corners.T, numpy.roll(corners, -1, axis = 0).T
+    with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+      x = x1 + (y - y1)*(x2 - x1)/(y2 - y1)
+    crossings = numpy.sort(numpy.where((y1 > y) != (y2 > y), x, numpy.inf), axis = 1)
+    crossings = numpy.clip(numpy.ceil(crossings - 0.5), 0, self.width).astype(int) # First pixel centre right of each crossing.
+
+    # Count the spans covering each pixel with a running sum over each row.
+    coverage = numpy.zeros((bottom - top, self.width + 1), dtype = int)
+    rows = numpy.broadcast_to(numpy.arange(bottom - top)[:, None], crossings.shape)
+    numpy.add.at(coverage, (rows[:, 0::2], crossings[:, 0::2]), 1)
+    numpy.add.at(coverage, (rows[:, 1::2], crossings[:, 1::2]), -1)
+    inside = numpy.cumsum(coverage, axis = 1)[:, :-1] > 0
+
+    region = self.image[top:bottom]
+    blended = (1 - opacity)*region[inside] + opacity*255*numpy.asarray(colour)
+    region[inside] = numpy.rint(blended).astype(numpy.uint8)
+
+def write_png(picture, f, dpi = 150):
+  """Rasterise a picture and write it to the binary file-like object f as a PNG image.
+
+    Points, arrows and polygons are drawn with NumPy, without LaTeX; labels are left out.
+
+    Parameters:
+      picture -- a Picture, e.g. from project_2d() or project_3d().
+      f -- a binary file-like object with a write() method.
+      dpi -- resolution in pixels per inch.
+  """
+  canvas = _Canvas(picture.bounds(), dpi)
+  for layer in picture.layers:
+    kind, xy = layer[0], layer[1]
+    if kind == 'points':
+      canvas.stamp(canvas.pixels(xy), POINT_RADIUS*canvas.scale, _rgb(layer[2], len(xy)))
+    elif kind == 'arrows':
+      width = LINE_WIDTHS[layer[3]]*PT
+      segments = numpy.vstack((xy, _arrow_heads(xy, width)))
+      pixels = numpy.hstack((canvas.pixels(segments[:, :2]), canvas.pixels(segments[:, 2:])))
+      canvas.segments(pixels, max(width*canvas.scale, 1.0), numpy.tile(_rgb(layer[2], len(xy)), (3, 1)))
+    elif kind == 'polygon':
+      corners = canvas.pixels(xy)
+      canvas.polygon(corners, _rgb(layer[2], 1)[0], layer[3])
+      canvas.segments(numpy.hstack((corners, numpy.roll(corners, -1, axis = 0))), max(LINE_WIDTHS['thin']*PT*canvas.scale, 1.0), _rgb('black', len(xy)))
+
+  # Each row of a PNG starts with its filter type, here 0 (none).
+  pixels = canvas.image.reshape(canvas.height, -1)
+  data = numpy.hstack((numpy.zeros((canvas.height, 1), dtype = numpy.uint8), pixels)).tobytes()
+  def chunk(kind, body):
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body) & 0xffffffff)
+  f.write(b'\x89PNG\r\n\x1a\n')
+  f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', canvas.width, canvas.height, 8, 2, 0, 0, 0)))
+  f.write(chunk(b'IDAT', zlib.compress(data, 6)))
+  f.write(chunk(b'IEND', b''))
+
+def render(picture, output, dpi = 150):
+  """Write a picture to the file output, choosing PNG, SVG or TikZ by its suffix (.png, .svg, anything else).
+
+    Parameters:
+      picture -- a Picture.
+      output -- path of the file to write.
+      dpi -- resolution of PNG output.
+  """
+  output = str(output)
+  if output.lower().endswith('.png'):
+    with open(output, 'wb') as f:
+      write_png(picture, f, dpi)
+  elif output.lower().endswith('.svg'):
+    with open(output, 'w') as f:
+      write_svg(picture, f)
+  else:
+    with open(output, 'w') as f:
+      write_tikz(picture, f)
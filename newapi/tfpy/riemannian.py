@@ -0,0 +1,148 @@
+import tfpy.base
+import tfpy.potential
+from collections import namedtuple
+import numpy
+import time
+
+def inner(U, V):
+  "The real inner product <U,V> = Re(trace(U'*V)) used on every manifold below."
+  return numpy.real(numpy.vdot(U, V))
+
+class ObliqueManifold(object):
+  "Matrices with unit-norm columns (Manopt's obliquefactory / obliquecomplexfactory); used for equal norm designs."
+  name = 'oblique'
+
+  @staticmethod
+  def project(X, G):
+    "Project G onto the tangent space at X."
+    return G - X*numpy.real(numpy.sum(X.conj()*G, axis = -2, keepdims = True))
+
+  @staticmethod
+  def retract(X, V):
+    Y = X + V
+    return Y/numpy.linalg.norm(Y, axis = -2, keepdims = True)
+
+class SphereManifold(object):
+  "Matrices of unit Frobenius norm (Manopt's spherefactory / spherecomplexfactory); used for weighted designs."
+  name = 'sphere'
+
+  @staticmethod
+  def project(X, G):
+    return G - X*inner(X, G)
+
+  @staticmethod
+  def retract(X, V):
+    Y = X + V
+    return Y/numpy.linalg.norm(Y)
+
+class EuclideanManifold(object):
+  """All d x n matrices (Manopt's euclideanfactory / euclideancomplexfactory), as in iterateOnDesignMO.m.
+
+    The potential is homogeneous, so this must be used with a potential that has its
+    normalisation_term set.
+  """
+  name = 'euclidean'
+
+  @staticmethod
+  def project(X, G):
+    return G
+
+  @staticmethod
+  def retract(X, V):
+    return X + V
+
+def manifold_for(design_type, euclidean = False):
+  """Return the manifold on which to optimise designs of the given type.
+
+    Equal norm designs live on the oblique manifold. Weighted designs live on the sphere (as in
+    DesignParameters.m) or, if euclidean is set, in Euclidean space (as in iterateOnDesignMO.m).
+  """
+  if design_type == tfpy.base.DesignType.EQUAL_NORM:
+    return ObliqueManifold
+  elif euclidean:
+    return EuclideanManifold
+  else:
+    return SphereManifold
+
+SolverResult = namedtuple('SolverResult', ['matrix', 'errors', 'iterations', 'time'])
+SolverResult.__doc__ = """The outcome of lbfgs().
+
+  Attributes:
+      matrix (numpy.array): the best d x n matrix found.
+      errors (numpy.array): the error after each iteration, starting with the initial error.
+      iterations (int): number of iterations performed.
+      time (float): wall time in seconds.
+"""
+
+def lbfgs(potential, manifold, X, max_iterations = 1000, threshold = 1e-15, gradient_tolerance = 1e-12, memory = 10):
+  """Minimise the potential on a manifold with Riemannian L-BFGS and an Armijo line search.
+
+    Vector transport is by projection onto the new tangent space, and the memory is discarded
+    whenever it fails to produce a descent direction.
+
+    Parameters:
+      potential -- a tfpy.potential.DesignPotential.
+      manifold -- one of ObliqueManifold, SphereManifold, EuclideanManifold.
+      X -- the starting point, which must lie on the manifold.
+      max_iterations -- maximum number of iterations.
+      threshold -- stop once the error is below this value.
+      gradient_tolerance -- stop once the norm of the Riemannian gradient is below this value.
+      memory -- number of previous steps used to approximate the Hessian.
+
+    Returns a SolverResult.
+  """
+  start = time.perf_counter()
+  error = potential.compute_error(X)
+  grad = manifold.project(X, potential.compute_gradient(X))
+  errors = [error]
+  pairs = [] # (s, y, 1/<s,y>), most recent last, all in the tangent space at X.
+
+  for h in range(max_iterations):
+    if error < threshold or numpy.sqrt(inner(grad, grad)) < gradient_tolerance:
+      break
+
+    # Two-loop recursion for -H*grad.
+    q = grad.copy()
+    alphas = []
+    for s, y, rho in reversed(pairs):
+      alpha = rho*inner(s, q)
+      q = q - alpha*y
+      alphas.append(alpha)
+    if pairs:
+      s, y, _ = pairs[-1]
+      q = q*(inner(s, y)/inner(y, y))
+    else:
+      q = q/numpy.sqrt(inner(grad, grad))
+    for (s, y, rho), alpha in zip(pairs, reversed(alphas)):
+      beta = rho*inner(y, q)
+      q = q + (alpha - beta)*s
+    direction = -q
+
+    slope = inner(grad, direction)
+    if slope >= 0:
+      pairs = []
+      direction = -grad/numpy.sqrt(inner(grad, grad))
+      slope = inner(grad, direction)
+
+    # Armijo backtracking.
+    step = 1.0
+    for _ in range(50):
+      X_new = manifold.retract(X, step*direction)
+      error_new = potential.compute_error(X_new)
+      if error_new <= error + 1e-4*step*slope:
+        break
+      step = step/2
+    else:
+      break # No decrease is possible at working precision.
+
+    grad_new = manifold.project(X_new, potential.compute_gradient(X_new))
+    s = manifold.project(X_new, step*direction)
+    y = grad_new - manifold.project(X_new, grad)
+    pairs.append((s, y, None))
+    pairs = [(manifold.project(X_new, s_old), manifold.project(X_new, y_old)) for s_old, y_old, _ in pairs[-memory:]]
+    pairs = [(s_old, y_old, 1/inner(s_old, y_old)) for s_old, y_old in pairs if inner(s_old, y_old) > 0]
+
+    X, error, grad = X_new, error_new, grad_new
+    errors.append(error)
+
+  return SolverResult(X, numpy.array(errors), len(errors) - 1, time.perf_counter() - start)
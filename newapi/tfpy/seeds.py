@@ -0,0 +1,131 @@
+import tfpy.base
+import tfpy.potential
+from tfpy.NumpyAdapter import normalise, random_matrix
+import numpy
+
+class SeedLibrary(object):
+  """A collection of known designs from which starting matrices for new searches are built.
+
+    For a target (d, n, t) the library proposes
+      * designs with the same d and n and a neighbouring t;
+      * designs with the same d and t and a slightly smaller n, with random vectors appended;
+      * designs with the same d and t and a slightly larger n, with vectors removed;
+      * unions of two designs with the same d and t or t-1 whose sizes add up to n;
+      * tensor products of designs in d1 and d2 dimensions with d1*d2 = d and n1*n2 = n;
+    and seed() returns the proposal with the smallest error. Real designs may seed complex ones.
+
+    The library also keeps count of the iterations taken by seeded and unseeded runs (as reported
+    by the adapters through record()), so that report() can estimate the iterations saved. Runs
+    for different parameters are not comparable, so only parameters with both kinds of run are
+    counted; with baseline = True, minimal_design() makes an extra unseeded run after every
+    seeded one to provide them.
+
+    A seed can lead the optimiser into a local minimum. With fallback = True, a seeded run that
+    misses the threshold is repeated unseeded; this is off by default, since on an n ladder every
+    n below the minimal one misses the threshold, so it would double the runs for all of them.
+
+  """
+  def __init__(self, designs = (), reach = 2, baseline = False, fallback = False, random_state = None):
+    """
+      Parameters: designs -- SphericalDesigns to start with, e.g. the result of DatabaseAdapter.search()
+                  reach -- largest number of vectors to append or remove
+                  baseline -- also run every seeded search unseeded, to measure the iterations saved
+                  fallback -- run a seeded search that misses the threshold again unseeded
+                  random_state -- seed for numpy.random.default_rng (optional)
+    """
+    self.reach = reach
+    self.baseline = baseline
+    self.fallback = fallback
+    self.rng = numpy.random.default_rng(random_state)
+    self._designs = {}
+    self._iterations = {}
+    for design in designs:
+      self.add(design)
+
+  def add(self, design):
+    "Add a design to the library, keeping only the best one for each set of parameters."
+    if design.matrix is None or design.error is None:
+      return
+    key = (design.d, design.n, design.t, design.field, design.design_type)
+    if key not in self._designs or design.error < self._designs[key].error:
+      self._designs[key] = design
+
+  def __len__(self):
+    return len(self._designs)
+
+  def _find(self, d = None, n = None, t = None, field = None, design_type = None):
+    for (dd, nn, tt, ff, yy), design in self._designs.items():
+      if (d is None or dd == d) and (n is None or nn == n) and (t is None or tt in t) and (yy == design_type) \
+         and (ff == field or (ff == tfpy.base.DesignField.REAL and field == tfpy.base.DesignField.COMPLEX)):
+        yield design
+
+  def proposals(self, d, n, t, field, design_type):
+    "Yield (description, matrix) pairs of candidate d x n starting matrices for a (d,n,t)-design."
+    for design in self._find(d, n, (t - 1, t + 1, t + 2), field, design_type):
+      yield f'({d},{n},{design.t}) design', design.matrix
+
+    for k in range(1, self.reach + 1):
+      for design in self._find(d, n - k, (t,), field, design_type):
+        yield f'({d},{n - k},{t}) design plus {k} vectors', numpy.concatenate((design.matrix, random_matrix(d, k, field, self.rng)), axis = 1)
+      for design in self._find(d, n + k, (t,), field, design_type):
+        # Drop the vectors with the smallest norms, which carry the least weight.
+        keep = numpy.sort(numpy.argsort(numpy.linalg.norm(design.matrix, axis = 0))[k:])
+        yield f'({d},{n + k},{t}) design minus {k} vectors', design.matrix[:, keep]
+
+    smaller = [design for design in self._find(d, None, (t - 1, t), field, design_type) if design.n < n]
+    for i, first in enumerate(smaller):
+      for second in smaller[i:]:
+        if first.n + second.n == n:
+          yield f'union of ({d},{first.n},{first.t}) and ({d},{second.n},{second.t}) designs', numpy.concatenate((first.matrix, second.matrix), axis = 1)
+
+    for d1 in range(2, d):
+      if d % d1 != 0:
+        continue
+      for first in self._find(d1, None, (t,), field, design_type):
+        if n % first.n != 0:
+          continue
+        for second in self._find(d//d1, n//first.n, (t,), field, design_type):
+          tensor = numpy.einsum('ai,bj->abij', first.matrix, second.matrix).reshape(d, n)
+          yield f'tensor of ({d1},{first.n},{t}) and ({d//d1},{second.n},{t}) designs', tensor
+
+  def seed(self, d, n, t, field, design_type):
+    """Return (description, matrix) for the best starting matrix the library can build, or None.
+
+      The matrix is normalised for the design type and has the smallest error among the proposals.
+    """
+    potential = tfpy.potential.DesignPotential(d, n, t, field, design_type)
+    best = None
+    for description, matrix in self.proposals(d, n, t, field, design_type):
+      matrix = normalise(numpy.asarray(matrix, dtype = 'complex128' if field == tfpy.base.DesignField.COMPLEX else 'float64'), design_type)
+      error = potential.compute_error(matrix)
+      if best is None or error < best[0]:
+        best = (error, description, matrix)
+    return None if best is None else best[1:]
+
+  def rerun_unseeded(self, design, seeded, threshold):
+    "Return whether the run producing design should be repeated without a seed (see fallback and baseline)."
+    return seeded and (self.baseline or (self.fallback and design.error >= threshold))
+
+  def record(self, design, iterations, seeded):
+    "Record the number of iterations the run producing design took, and whether it was started from a library seed."
+    if iterations is not None:
+      key = (design.d, design.n, design.t, design.field, design.design_type)
+      self._iterations.setdefault(key, {True: [], False: []})[bool(seeded)].append(iterations)
+
+  def iterations_saved(self):
+    """Return (number of parameters compared, mean iterations seeded, mean iterations unseeded).
+
+      Only parameters for which both seeded and unseeded runs were recorded are compared.
+    """
+    pairs = [(numpy.mean(runs[True]), numpy.mean(runs[False])) for runs in self._iterations.values() if runs[True] and runs[False]]
+    if not pairs:
+      return 0, None, None
+    seeded, unseeded = numpy.mean(pairs, axis = 0)
+    return len(pairs), seeded, unseeded
+
+  def report(self):
+    "Return a one-line summary of the iterations saved by seeding."
+    count, seeded, unseeded = self.iterations_saved()
+    if count == 0:
+      return 'No parameters with both seeded and unseeded runs recorded; not enough to compare (try baseline = True).'
+    return f'Over {count} parameter sets, seeded runs took {seeded:.1f} iterations on average and unseeded runs {unseeded:.1f}: {unseeded - seeded:.1f} iterations saved per run.'
@@ -0,0 +1,150 @@
+import abc
+import tfpy.base
+
+class LazySphericalDesign(tfpy.base.SphericalDesign):
+  """A stored SphericalDesign whose matrix, Gramian and 3-products are only fetched when first used.
+
+    Proxies are returned by search(lazy = True) and minimal_designs(lazy = True) of a
+    StorageAdapter, filled with the parameters and error only. Reading matrix, gramian or
+    triple_products loads them from the store, which must still be open, and raises KeyError if
+    the design has been deleted since; the store's prefetch() loads a whole list of proxies in a
+    few queries instead of one query each.
+
+  """
+  def __init__(self, database, dbid, d, n, t, field, design_type, error = None):
+    super().__init__(d, n, t, field, design_type, None, error)
+    self.dbid = dbid
+    self._database = database
+    self._loaded = False
+
+  @classmethod
+  def from_document(cls, database, dct):
+    "Construct a proxy from a stored document, ignoring any matrix fields in it."
+    proxy = cls(database, dct['_id'], dct['d'], dct['n'], dct['t'], tfpy.base.DesignField(dct['field']), tfpy.base.DesignType(dct['design_type']), dct.get('error'))
+    proxy.symmetry = dct.get('symmetry')
+    return proxy
+
+  @property
+  def loaded(self):
+    return self._loaded
+
+  def load(self, dct = None):
+    """Fill in the matrix, Gramian and 3-products from the stored document dct (default: fetch it).
+
+      Raises KeyError if the design is fetched but is no longer in the store.
+    """
+    if dct is None:
+      self._database.prefetch([self])
+      if not self._loaded:
+        raise KeyError(f'The design {self.dbid} ({self.d},{self.n},{self.t}) {self.field.value} {self.design_type.value} is no longer in the store.')
+      return
+    if dct.get('matrix') is not None:
+      stored = tfpy.base.SphericalDesign.from_dict(dct)
+      self._matrix, self._gramian, self._triple_products = stored.matrix, stored._gramian, stored._triple_products
+    self._loaded = True
+
+  @property
+  def matrix(self):
+    if not self._loaded:
+      self.load()
+    return self._matrix
+
+  @matrix.setter
+  def matrix(self, matrix):
+    self._matrix = matrix
+    self._loaded = matrix is not None
+
+  @property
+  def gramian(self):
+    if not self._loaded:
+      self.load()
+    return tfpy.base.SphericalDesign.gramian.fget(self)
+
+  @property
+  def triple_products(self):
+    if not self._loaded:
+      self.load()
+    return tfpy.base.SphericalDesign.triple_products.fget(self)
+
+class StorageAdapter(abc.ABC):
+  """The interface shared by the design stores, tfpy.DatabaseAdapter (MongoDB) and tfpy.LocalDatabaseAdapter.
+
+    A store is a context manager. Designs are identified by the dbid returned by insert() and
+    set on the designs that search() returns; its type depends on the store.
+
+  """
+  # Fields holding large arrays, left out of search results when only metadata is wanted.
+  MATRIX_FIELDS = ('matrix', 'gramian', 'triple_products')
+
+  @abc.abstractmethod
+  def __enter__(self):
+    pass
+
+  @abc.abstractmethod
+  def __exit__(self, exc_type, exc_value, traceback):
+    pass
+
+  @abc.abstractmethod
+  def search(self, metadata_only = False, projection = None, batch_size = None, lazy = False, **kwargs):
+    "Return an iterator over the stored designs whose parameters take any of the given values."
+
+  @abc.abstractmethod
+  def minimal_designs(self, threshold = None, group_by = ('d', 't', 'field', 'design_type'), metadata_only = True, lazy = False, **kwargs):
+    "Return the design with the smallest n, then the smallest error, in each group of stored designs."
+
+  @abc.abstractmethod
+  def prefetch(self, designs, batch_size = 1000):
+    "Load the matrices of the LazySphericalDesigns in designs that have not been loaded yet (skipping any no longer stored), and return designs."
+
+  @abc.abstractmethod
+  def insert(self, design):
+    "Store a design and return its dbid."
+
+  @abc.abstractmethod
+  def upsert_if_better(self, design):
+    "Store a design unless a design with the same parameters and no larger error is stored."
+
+  @abc.abstractmethod
+  def update(self, dbid, design):
+    "Replace the stored design dbid by design."
+
+  @abc.abstractmethod
+  def delete(self, dbid):
+    "Remove the stored design dbid."
+
+  @abc.abstractmethod
+  def record_failure(self, design):
+    "Record an attempt at the design's parameters that did not meet the caller's threshold."
+
+  @abc.abstractmethod
+  def find_failure(self, d, n, t, field, design_type):
+    "Return the failure record for the given parameters (a dict with error, attempts and time) or None."
+
+  def flush(self):
+    "Write out any buffered writes."
+
+def open_storage(location = None, **kwargs):
+  """Return the store at location, without entering it.
+
+    Parameters:
+      location -- a mongodb:// URI, or None for the MongoDB server on localhost, gives a
+                  tfpy.DatabaseAdapter; anything else is taken as the path of a
+                  tfpy.LocalDatabaseAdapter.
+      kwargs -- passed on to the adapter (e.g. buffer_size).
+  """
+  if location is None or str(location).startswith(('mongodb://', 'mongodb+srv://')):
+    from tfpy.DatabaseAdapter import DatabaseAdapter
+    return DatabaseAdapter(host = location, **kwargs)
+  from tfpy.LocalDatabaseAdapter import LocalDatabaseAdapter
+  return LocalDatabaseAdapter(location, **kwargs)
+
+def copy_designs(source, destination, batch_size = 1000, **kwargs):
+  """Insert every design of the open store source (or those matching kwargs, as for search()) into destination.
+
+    Returns the number of designs copied.
+  """
+  count = 0
+  for design in source.search(batch_size = batch_size, **kwargs):
+    destination.insert(design)
+    count = count + 1
+  return count